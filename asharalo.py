@@ -2,76 +2,92 @@ import dash
 import dash.dcc as dcc
 import dash.html as html
 from dash.dependencies import Input, Output
-import pandas as pd
-import plotly.express as px
+from asharalo_cache import figure_cache
+from asharalo_data import current, value_counts
+from asharalo_figures import bar
+from asharalo_index import select
+from asharalo_locations import LocationTree, options
+from asharalo_metrics import lap, metrics, rows
+from asharalo_server import dash_kwargs, register_http
 
-# Load CSV data directly from the provided URL
-url = "https://raw.githubusercontent.com/mamunalbd4/asharalo/main/asharalofinal.csv"
-df = pd.read_csv(url)
+# The survey comes from the shared, locally cached loader, which can swap in a new
+# version at any time; each request works on the version current when it started.
+# Load it (and its District → Upazilla → Union → Village tree) before serving.
+current().derive(LocationTree)
 
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, **dash_kwargs('/summary/'))
 server=app.server
-# Initialize layout
-app.layout = html.Div([
-    html.H1("Ashar Alo Project Baseline Survey (Summery)", style={'textAlign': 'center'}),  # Add the header
-    dcc.Dropdown(
-        id='district-dropdown',
-        options=[{'label': district, 'value': district} for district in df['District'].unique()],
-        value=df['District'].unique()[0],
-        placeholder="Select a District"
-    ),
-    dcc.Dropdown(
-        id='upazilla-dropdown',
-        placeholder="Select a Upazilla"
-    ),
-    dcc.Dropdown(
-        id='union-dropdown',
-        placeholder="Select a Union"
-    ),
-    dcc.Dropdown(
-        id='village-dropdown',
-        placeholder="Select a Village",
-        style={'display': 'none'}  # Hiding the dropdown
-    ),
-    dcc.RadioItems(
-        id='gender-radio',
-        options=[
-            {'label': 'All Genders', 'value': 'All'},
-            {'label': 'Male', 'value': 'Male'},
-            {'label': 'Female', 'value': 'Female'},
-        ],
-        value='All',
-        labelStyle={'display': 'block', 'margin-right': '10px'}  # Add margin for spacing
-    ),
-    dcc.RadioItems(
-        id='disability-card-radio',
-        options=[
-            {'label': 'All Disability Cards', 'value': 'All'},
-            {'label': 'Has Disability Card', 'value': 'Yes'},
-            {'label': 'No Disability Card', 'value': 'No'},
-        ],
-        value='All',
-        labelStyle={'display': 'block', 'margin-right': '10px'}  # Add margin for spacing
-    ),
-    dcc.Graph(id='bar-chart')
-])
+register_http(server)
+figure_cache.register(server)
+metrics.register(server)
+# Initialize layout, rebuilt on every page load so the districts follow the current data
+def serve_layout():
+    dataset = current()
+    locations = dataset.derive(LocationTree)
+    return html.Div([
+        html.H1("Ashar Alo Project Baseline Survey (Summery)", style={'textAlign': 'center'}),  # Add the header
+        dcc.Dropdown(
+            id='district-dropdown',
+            options=options(locations.children_of()),
+            value=dataset.frame['District'].unique()[0],
+            placeholder="Select a District"
+        ),
+        dcc.Dropdown(
+            id='upazilla-dropdown',
+            placeholder="Select a Upazilla"
+        ),
+        dcc.Dropdown(
+            id='union-dropdown',
+            placeholder="Select a Union"
+        ),
+        dcc.Dropdown(
+            id='village-dropdown',
+            placeholder="Select a Village",
+            style={'display': 'none'}  # Hiding the dropdown
+        ),
+        dcc.RadioItems(
+            id='gender-radio',
+            options=[
+                {'label': 'All Genders', 'value': 'All'},
+                {'label': 'Male', 'value': 'Male'},
+                {'label': 'Female', 'value': 'Female'},
+            ],
+            value='All',
+            labelStyle={'display': 'block', 'margin-right': '10px'}  # Add margin for spacing
+        ),
+        dcc.RadioItems(
+            id='disability-card-radio',
+            options=[
+                {'label': 'All Disability Cards', 'value': 'All'},
+                {'label': 'Has Disability Card', 'value': 'Yes'},
+                {'label': 'No Disability Card', 'value': 'No'},
+            ],
+            value='All',
+            labelStyle={'display': 'block', 'margin-right': '10px'}  # Add margin for spacing
+        ),
+        dcc.Graph(id='bar-chart')
+    ])
+
+app.layout = serve_layout
 
 @app.callback(
     Output('upazilla-dropdown', 'options'),
     Input('district-dropdown', 'value')
 )
+@metrics.instrument
 def update_upazilla_dropdown(selected_district):
-    upazillas = df[df['District'] == selected_district]['Upazilla'].unique()
-    return [{'label': upazilla, 'value': upazilla} for upazilla in upazillas]
+    locations = current().derive(LocationTree)
+    return options(locations.children_of(selected_district))
 
 @app.callback(
     Output('union-dropdown', 'options'),
     [Input('district-dropdown', 'value'),
      Input('upazilla-dropdown', 'value')]
 )
+@metrics.instrument
 def update_union_dropdown(selected_district, selected_upazilla):
-    unions = df[(df['District'] == selected_district) & (df['Upazilla'] == selected_upazilla)]['Union'].unique()
-    return [{'label': union, 'value': union} for union in unions]
+    locations = current().derive(LocationTree)
+    return options(locations.children_of(selected_district, selected_upazilla))
 
 @app.callback(
     Output('bar-chart', 'figure'),
@@ -81,53 +97,55 @@ def update_union_dropdown(selected_district, selected_upazilla):
      Input('gender-radio', 'value'),
      Input('disability-card-radio', 'value')]
 )
+@metrics.instrument
+@figure_cache.memoize
 def update_bar_chart(selected_district, selected_upazilla, selected_union, selected_gender, selected_disability_card):
+    df = current().frame
     
-    # Filter by selected gender
-    if selected_gender != 'All':
-        filtered_df = df[df['Gender'] == selected_gender]
-    else:
-        filtered_df = df
-
-    # Filter by selected disability card
-    if selected_disability_card != 'All':
-        filtered_df = filtered_df[df['Have a disability golden citizen card?'] == selected_disability_card]
+    # Filter by selected gender, disability card and district in one pass
+    filters = {
+        'Gender': selected_gender,
+        'Have a disability golden citizen card?': selected_disability_card,
+        'District': selected_district,
+    }
 
     # If only District is selected
     if selected_upazilla is None and selected_union is None:
-        filtered_df = filtered_df[filtered_df['District'] == selected_district]
-        village_counts = filtered_df['Upazilla'].value_counts().reset_index()
-        village_counts.columns = ['Upazilla', 'Village Count']
-        fig = px.bar(village_counts, x='Upazilla', y='Village Count', color='Upazilla', 
-                     title='Count of Villages per Upazilla',
-                     labels={'Upazilla': 'Upazilla', 'Village Count': 'Number of Villages'},
-                     height=400)
+        filtered = select(df, filters, 'Upazilla')
+        lap('filter')
+        rows(len(df), len(filtered))
+        village_counts = value_counts(filtered)
+        lap('aggregate')
+        fig = bar(village_counts.index, village_counts.values, 'Upazilla', 'Number of Villages',
+                  title='Count of Villages per Upazilla', height=400)
+        lap('figure')
         return fig
     
     # If District and Upazilla are selected
     elif selected_union is None:
-        filtered_df = filtered_df[(filtered_df['District'] == selected_district) & (filtered_df['Upazilla'] == selected_upazilla)]
-        village_counts = filtered_df['Union'].value_counts().reset_index()
-        village_counts.columns = ['Union', 'Village Count']
-        fig = px.bar(village_counts, x='Union', y='Village Count', color='Union',
-                     title='Count of Villages per Union',
-                     labels={'Union': 'Union', 'Village Count': 'Number of Villages'},
-                     height=400)
+        filters['Upazilla'] = selected_upazilla
+        filtered = select(df, filters, 'Union')
+        lap('filter')
+        rows(len(df), len(filtered))
+        village_counts = value_counts(filtered)
+        lap('aggregate')
+        fig = bar(village_counts.index, village_counts.values, 'Union', 'Number of Villages',
+                  title='Count of Villages per Union', height=400)
+        lap('figure')
         return fig
 
     # If District, Upazilla, and Union are selected
     else:
-        filtered_df = filtered_df[
-            (filtered_df['District'] == selected_district) & 
-            (filtered_df['Upazilla'] == selected_upazilla) & 
-            (filtered_df['Union'] == selected_union)
-        ]
-        village_counts = filtered_df['Name of the village'].value_counts().reset_index()
-        village_counts.columns = ['Name of the village', 'Count']
-        fig = px.bar(village_counts, x='Name of the village', y='Count', color='Name of the village',
-                     title='Data Count per Village in Selected Union',
-                     labels={'Name of the village': 'Village', 'Count': 'Data Count'},
-                     height=400)
+        filters['Upazilla'] = selected_upazilla
+        filters['Union'] = selected_union
+        filtered = select(df, filters, 'Name of the village')
+        lap('filter')
+        rows(len(df), len(filtered))
+        village_counts = value_counts(filtered)
+        lap('aggregate')
+        fig = bar(village_counts.index, village_counts.values, 'Village', 'Data Count',
+                  title='Data Count per Village in Selected Union', height=400)
+        lap('figure')
         return fig
 
 if __name__ == '__main__':
@@ -1,13 +1,14 @@
-import pandas as pd
 import plotly.express as px
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
 from dash.dependencies import Input, Output
-
-# Load the CSV data into a Pandas DataFrame
-url = 'https://raw.githubusercontent.com/mamunalbd4/asharalo/main/asharalofinal.csv'
-df = pd.read_csv(url)
+from asharalo_cache import figure_cache
+from asharalo_cube import Cube, additive, answer_counts
+from asharalo_data import current
+from asharalo_index import FilterIndex
+from asharalo_metrics import lap, metrics
+from asharalo_server import dash_kwargs, register_http
 
 # Define the categories based on the corrected column names
 categories = [
@@ -23,32 +24,90 @@ categories = [
     "In health rehabilitation service did you get Both (Asisstive device and Therapy) "
 ]
 
+# Counts for one version of the survey data
+def build_cube(df):
+    # Row bitmaps for the gender and disability card dropdowns
+    index = FilterIndex(df, {'gender': 'Gender', 'disability': 'Have a disability golden citizen card?'})
+
+    # Yes / No counts matrix for all categories, precomputed for every dropdown combination ('All' included)
+    return Cube(df, index, {'answer_counts': additive(lambda filtered_df: answer_counts(filtered_df, categories))})
+
+# Define the available options for the dropdowns
+def dropdown_options(df):
+    gender_options = [{'label': 'All', 'value': 'All'}] + [{'label': gender, 'value': gender} for gender in df['Gender'].dropna().unique()]
+    disability_options = [{'label': 'All', 'value': 'All'}] + [{'label': option, 'value': option} for option in df['Have a disability golden citizen card?'].dropna().unique()]
+    return gender_options, disability_options
+
+# Load the survey data and build its counts before serving; a newer version gets its own cube
+current().derive(build_cube)
+
 # Initialize the Dash app
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, **dash_kwargs('/allowance-services/'))
 server=app.server
+register_http(server)
+figure_cache.register(server)
+metrics.register(server)
+
+# Define the layout of the Dash app with CSS styling for center alignment. Only the
+# skeleton is sent up front; the pie of the selected category is delivered by a callback.
+# It is rebuilt on every page load so the dropdown options follow the current data.
+def serve_layout():
+    gender_options, disability_options = current().derive(dropdown_options)
+    return html.Div([
+        html.Div(
+            html.H1("Allowance and Services Provide Information", style={'textAlign': 'center'}),
+            style={'margin-top': '20px'}
+        ),
+        html.Div([
+            html.Label("Filter by Gender:"),
+            dcc.Dropdown(
+                id='gender-dropdown',
+                options=gender_options,
+                value='All'
+            ),
+        ], style={'width': '45%', 'display': 'inline-block', 'margin-left': '5%'}),
+        html.Div([
+            html.Label("Filter by Disability/Golden Citizen Card:"),
+            dcc.Dropdown(
+                id='disability-dropdown',
+                options=disability_options,
+                value='All'
+            ),
+        ], style={'width': '45%', 'display': 'inline-block'}),
+        dcc.Tabs(
+            id='category-tabs',
+            value=categories[0],
+            children=[dcc.Tab(label=category.strip(), value=category) for category in categories]
+        ),
+        dcc.Graph(id='category-pie-chart')
+    ])
+
+app.layout = serve_layout
 
-# Define the layout of the Dash app with CSS styling for center alignment
-app.layout = html.Div([
-    html.Div(
-        html.H1("Allowance and Services Provide Information", style={'textAlign': 'center'}),
-        style={'margin-top': '20px'}
-    ),
-    *[dcc.Graph(
-        id=f'pie-chart-{category}',
-        figure={
-            'data': [
-                {
-                    'labels': ['Yes', 'No'],
-                    'values': [df[category].value_counts().get('Yes', 0), df[category].value_counts().get('No', 0)],
-                    'type': 'pie'
-                }
-            ],
-            'layout': {
-                'title': f'Distribution of {category}'
+@app.callback(
+    Output('category-pie-chart', 'figure'),
+    Input('category-tabs', 'value'),
+    Input('gender-dropdown', 'value'),
+    Input('disability-dropdown', 'value')
+)
+@metrics.instrument
+@figure_cache.memoize
+def update_category_pie_chart(category, selected_gender='All', selected_disability='All'):
+    cube = current().derive(build_cube)
+    counts = cube.get(gender=selected_gender, disability=selected_disability)['answer_counts']
+    lap('aggregate')
+    return {
+        'data': [
+            {
+                'labels': ['Yes', 'No'],
+                'values': [int(counts.at[category, 'Yes']), int(counts.at[category, 'No'])],
+                'type': 'pie'
             }
+        ],
+        'layout': {
+            'title': f'Distribution of {category}'
         }
-    ) for category in categories]
-])
+    }
 
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -0,0 +1,34 @@
+import importlib
+
+import asharalo_data
+import asharalo_server
+
+# One Flask server and worker pool for every dashboard: gunicorn asharalo_app:server
+server = asharalo_server.host()
+
+# Dashboard modules with their URL prefix and title; each mounts itself on import
+dashboards = [
+    ('asharalo', '/summary/', 'Baseline Survey (Summery)'),
+    ('asharalo_family_income', '/family-income/', 'Income Situation'),
+    ('asharalo_person_income', '/person-income/', 'Person Income Situation'),
+    ('asharalo_education', '/education/', 'Education Summary'),
+    ('asharalo_allowence_services', '/allowance-services/', 'Allowance and Services Provide Information'),
+    ('asharalo_personal information', '/personal-information/', 'Location-wise Personal Information'),
+]
+
+apps = {module: importlib.import_module(module).app for module, _, _ in dashboards}
+
+
+@server.route('/')
+def index():
+    links = ''.join(f'<li><a href="{prefix}">{title}</a></li>' for _, prefix, title in dashboards)
+    return (
+        '<!DOCTYPE html><html><head><title>Ashar Alo Project</title></head>'
+        '<body style="text-align: center"><h1>Ashar Alo Project Dashboards</h1>'
+        f'<ul style="display: inline-block; text-align: left">{links}</ul></body></html>'
+    )
+
+
+if __name__ == '__main__':
+    asharalo_data.start_refresher()
+    server.run(debug=True)
@@ -0,0 +1,262 @@
+"""Latency, throughput, memory and payload benchmark of every dashboard callback.
+
+Loads a synthetic survey of each requested size, calls every callback over its
+filter combinations and reports per callback the p50/p95/p99 latency, rows per
+second, peak memory, JSON encoding time and payload size. The streamed CSV export
+of the records table is measured the same way, its payload being the download. Results can be saved as
+a baseline and later runs compared against it:
+
+    python asharalo_benchmark.py --rows 10000 100000 --save benchmark.json
+    python asharalo_benchmark.py --rows 10000 100000 --baseline benchmark.json
+"""
+import argparse
+import importlib
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from plotly.io.json import to_json_plotly
+
+import asharalo_data
+import asharalo_synthetic
+from asharalo_cache import figure_cache
+from asharalo_index import ALL
+from asharalo_locations import LocationTree
+
+# Dashboard modules, imported once; each benchmark size swaps in its own dataset
+modules = [
+    'asharalo',
+    'asharalo_family_income',
+    'asharalo_person_income',
+    'asharalo_education',
+    'asharalo_allowence_services',
+    'asharalo_personal information',
+]
+
+# Latency, memory or payload this much above the baseline counts as a regression
+tolerance = 0.2
+
+
+def values(frame, column):
+    """The filter values a dropdown over ``column`` offers, 'All' first."""
+    return [ALL] + sorted(frame[column].dropna().unique().tolist())
+
+
+def sample(combinations, limit):
+    """At most ``limit`` of ``combinations``, spread evenly over them."""
+    combinations = list(combinations)
+    if limit and len(combinations) > limit:
+        step = len(combinations) / limit
+        combinations = [combinations[int(i * step)] for i in range(limit)]
+    return combinations
+
+
+class Streamed:
+    """A download drained the way its response streams it, keeping only its size in bytes."""
+
+    def __init__(self, parts):
+        self.size = sum(len(part.encode() if isinstance(part, str) else part) for part in parts)
+
+
+def cases(apps, dataset, limit=None):
+    """(name, callback, argument tuples) for every callback of every dashboard."""
+    frame = dataset.frame
+    tree = dataset.derive(LocationTree)
+    genders = values(frame, 'Gender')
+    disabilities = values(frame, 'Have a disability golden citizen card?')
+    skilled = values(frame, 'Is the person Skilled?')
+
+    # Location selections at every depth: districts, upazillas and unions
+    districts = [(district,) for district, _ in tree.children_of()]
+    upazillas = [path + (name,) for path in districts for name, _ in tree.children_of(*path)]
+    unions = [path + (name,) for path in upazillas for name, _ in tree.children_of(*path)]
+    locations = [path + (None,) * (3 - len(path)) for path in districts + upazillas + unions]
+
+    def selection(path):
+        # Multi-select values choosing ``path`` and every location below it, down to the villages
+        chosen = [[name] for name in path if name is not None]
+        while len(chosen) < 4:
+            chosen.append([name for name, _ in tree.children_of_names(len(chosen) - 1, chosen[-1])])
+        return tuple(chosen)
+
+    summary = apps['asharalo']
+    family = apps['asharalo_family_income']
+    person = apps['asharalo_person_income']
+    education = apps['asharalo_education']
+    allowance = apps['asharalo_allowence_services']
+    personal = apps['asharalo_personal information']
+    table_filters = [
+        (0, personal.page_size, None, ''),
+        (1, personal.page_size, [{'column_id': 'Age', 'direction': 'desc'}], ''),
+        (0, personal.page_size, None, '{Age} >= 18 && {Name of child / person} contains 1'),
+    ]
+    # The whole survey first: the export whose memory must not grow with its size
+    everything = [[name for name, _ in tree.children_of()]]
+    while len(everything) < 4:
+        everything.append([name for name, _ in tree.children_of_names(len(everything) - 1, everything[-1])])
+    exports = [tuple(everything) + ([0, 100], ALL, '')] + sample(
+        [selection(path) + ([0, 100], gender, query)
+         for path, gender, query in itertools.product(locations, genders, ('', table_filters[-1][-1]))], limit)
+
+    def export_csv(*args):
+        return Streamed(personal.export_csv(personal.export_chunks(frame, *args)))
+
+    return [
+        ('asharalo.update_upazilla_dropdown', summary.update_upazilla_dropdown,
+         sample(districts, limit)),
+        ('asharalo.update_union_dropdown', summary.update_union_dropdown,
+         sample(upazillas, limit)),
+        ('asharalo.update_bar_chart', summary.update_bar_chart,
+         sample([path + (gender, card) for path, gender, card in itertools.product(locations, genders, disabilities)], limit)),
+        ('asharalo_family_income.update_charts', family.update_charts,
+         sample(itertools.product(genders, disabilities), limit)),
+        ('asharalo_person_income.update_charts', person.update_charts,
+         sample(itertools.product(genders, disabilities, skilled), limit)),
+        ('asharalo_education.update_charts', education.update_charts,
+         sample(itertools.product(genders, disabilities), limit)),
+        ('asharalo_allowence_services.update_category_pie_chart', allowance.update_category_pie_chart,
+         sample(itertools.product(allowance.categories, genders, disabilities), limit)),
+        ('asharalo_personal information.update_upazilla_options', personal.update_upazilla_options,
+         sample([([path[0]],) for path in districts], limit)),
+        ('asharalo_personal information.update_union_options', personal.update_union_options,
+         sample([([path[1]],) for path in upazillas], limit)),
+        ('asharalo_personal information.update_village_options', personal.update_village_options,
+         sample([([path[2]],) for path in unions], limit)),
+        ('asharalo_personal information.update_table', personal.update_table,
+         sample([selection(path) + ([0, 100], gender) + table
+                 for path, gender, table in itertools.product(locations, genders, table_filters)], limit)),
+        ('asharalo_personal information.update_export_links', personal.update_export_links, exports),
+        ('asharalo_personal information.export.csv', export_csv, exports),
+    ]
+
+
+def payload(result):
+    """The JSON Dash sends for a callback result, encoded the way Dash encodes it."""
+    return to_json_plotly(result)
+
+
+def measure(func, arguments, rows, repeat=3):
+    """Timings, peak memory and payload size of ``func`` over every argument tuple.
+
+    The figure cache is cleared before each call, so every call computes its result.
+    A download's peak memory is what streaming it holds at once, not its size.
+    """
+    timings = []
+    encodings = []
+    payloads = []
+    for args in arguments * repeat:
+        figure_cache.clear()
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+        if isinstance(result, Streamed):
+            # Encoded as it streamed, within the call's timing
+            payloads.append(result.size)
+            encodings.append(0.0)
+            continue
+        start = time.perf_counter()
+        payloads.append(len(payload(result)))
+        encodings.append(time.perf_counter() - start)
+
+    # Separate pass: tracing allocations would distort the timings above
+    peak = 0
+    for args in arguments:
+        figure_cache.clear()
+        tracemalloc.start()
+        func(*args)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+    return {
+        'calls': len(timings),
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'rows_per_sec': round(rows / (p50 / 1000)) if p50 else None,
+        'serialize_ms': round(float(np.percentile(encodings, 50)) * 1000, 3),
+        'peak_kb': round(peak / 1024, 1),
+        'payload_bytes': round(float(np.mean(payloads))),
+    }
+
+
+def import_apps(dataset):
+    """Import every dashboard module against ``dataset`` instead of the real survey."""
+    asharalo_data.swap(dataset)
+    return {module: importlib.import_module(module) for module in modules}
+
+
+def run(sizes, repeat=3, limit=None, seed=0, fan_out=asharalo_synthetic.fan_out):
+    """Benchmark every callback for each dataset size in ``sizes``; returns the report."""
+    report = {}
+    apps = None
+    for rows in sizes:
+        frame = asharalo_synthetic.survey(rows, seed, fan_out)
+        dataset = asharalo_data.Dataset(frame, f"synthetic-{rows}-{seed}-{'x'.join(map(str, fan_out))}")
+        start = time.perf_counter()
+        if apps is None:
+            apps = import_apps(dataset)
+        else:
+            # Build the new dataset's indexes and cubes the way a refresh would
+            builders = asharalo_data.current().builders()
+            asharalo_data.swap(dataset)
+            for builder in builders:
+                dataset.derive(builder)
+        results = {'load_s': round(time.perf_counter() - start, 3), 'callbacks': {}}
+        for name, func, arguments in cases(apps, dataset, limit):
+            results['callbacks'][name] = measure(func, arguments, rows, repeat)
+        report[str(rows)] = results
+    return report
+
+
+def compare(report, baseline, tolerance=tolerance):
+    """Regressions of ``report`` against ``baseline``, as readable lines."""
+    regressions = []
+    for rows, results in report.items():
+        for name, stats in results['callbacks'].items():
+            before = baseline.get(rows, {}).get('callbacks', {}).get(name)
+            if before is None:
+                continue
+            for key in ('p95_ms', 'peak_kb', 'payload_bytes'):
+                if before[key] and stats[key] > before[key] * (1 + tolerance):
+                    regressions.append(f"{rows} rows {name}: {key} {before[key]} -> {stats[key]}")
+    return regressions
+
+
+def print_report(report):
+    header = f"{'rows':>9}  {'callback':<58} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rows/s':>12} {'json ms':>9} {'peak KB':>9} {'bytes':>9}"
+    print(header)
+    for rows, results in report.items():
+        for name, stats in results['callbacks'].items():
+            print(f"{rows:>9}  {name:<58} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9} "
+                  f"{stats['rows_per_sec'] or '':>12} {stats.get('serialize_ms', ''):>9} {stats['peak_kb']:>9} {stats['payload_bytes']:>9}")
+        print(f"{rows:>9}  {'(load and build)':<58} {results['load_s'] * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000], help="synthetic survey sizes")
+    parser.add_argument('--repeat', type=int, default=3, help="timed calls per filter combination")
+    parser.add_argument('--limit', type=int, default=200, help="filter combinations per callback (0: all)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fan-out', type=int, nargs=4, default=asharalo_synthetic.fan_out,
+                        metavar=('DISTRICTS', 'UPAZILLAS', 'UNIONS', 'VILLAGES'))
+    parser.add_argument('--save', help="write the report as JSON, e.g. to use as a baseline")
+    parser.add_argument('--baseline', help="compare against a saved report; exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=tolerance)
+    args = parser.parse_args()
+
+    report = run(args.rows, args.repeat, args.limit, args.seed, tuple(args.fan_out))
+    print_report(report)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,128 @@
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+from flask import jsonify
+
+from asharalo_data import dataset_version
+
+try:
+    import diskcache
+except ImportError:  # diskcache is optional; without it each worker keeps only its own cache
+    diskcache = None
+
+# Figures kept per worker before the least recently used one is evicted
+maxsize = int(os.environ.get('ASHARALO_FIGURE_CACHE_SIZE', 512))
+
+# Optional on-disk cache shared by every gunicorn worker on the host
+shared_dir = os.environ.get('ASHARALO_FIGURE_CACHE_DIR')
+shared_size_limit = int(os.environ.get('ASHARALO_FIGURE_CACHE_BYTES', 256 * 1024 * 1024))
+
+_missing = object()
+
+
+def normalize(value):
+    """Hashable form of a callback input: lists become tuples, dicts sorted item tuples."""
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, normalize(item)) for key, item in value.items()))
+    return value
+
+
+class FigureCache:
+    """LRU cache of callback results keyed by the normalized inputs and the dataset version.
+
+    Each worker keeps its own bounded in-memory LRU. When ``directory`` is set and
+    diskcache is installed, misses fall through to an on-disk LRU shared by all
+    workers on the host.
+    """
+
+    def __init__(self, maxsize=maxsize, directory=shared_dir):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared = None
+        if directory and diskcache is not None:
+            self.shared = diskcache.Cache(directory, size_limit=shared_size_limit,
+                                          eviction_policy='least-recently-used')
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key, _missing)
+            if value is not _missing:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.shared is not None:
+            value = self.shared.get(key, _missing)
+            if value is not _missing:
+                with self.lock:
+                    self.shared_hits += 1
+                self._store(key, value)
+                return value
+        with self.lock:
+            self.misses += 1
+        return _missing
+
+    def _store(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def memoize(self, func):
+        """Decorator caching ``func``'s result per normalized arguments and dataset version."""
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name, dataset_version(), normalize(args), normalize(kwargs))
+            value = self.get(key)
+            if value is _missing:
+                value = func(*args, **kwargs)
+                self.set(key, value)
+            return value
+
+        return wrapper
+
+    def info(self):
+        with self.lock:
+            requests = self.hits + self.shared_hits + self.misses
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.shared_hits) / requests if requests else 0.0,
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'shared': self.shared is not None,
+            }
+
+    def register(self, server):
+        """Expose the cache statistics as JSON on ``/_figure-cache`` of a Flask server."""
+        if 'figure_cache' not in server.view_functions:
+            server.add_url_rule('/_figure-cache', 'figure_cache', lambda: jsonify(self.info()))
+
+
+# Process-wide cache shared by every app's callbacks
+figure_cache = FigureCache()
@@ -0,0 +1,113 @@
+import copy
+import itertools
+
+import pandas as pd
+
+from asharalo_index import ALL
+from asharalo_pool import run
+
+
+def answer_counts(frame, columns, answers=('Yes', 'No')):
+    """Counts matrix of ``answers`` (columns) per survey question in ``columns`` (rows).
+
+    Each answer is counted across all questions at once with a vectorized
+    equality test, instead of one value_counts() per column. Answers outside
+    ``answers`` (blanks, 'Not Applicable', ...) are ignored.
+    """
+    frame = frame[list(columns)]
+    return pd.DataFrame({answer: (frame == answer).sum() for answer in answers},
+                        index=list(columns), columns=list(answers))
+
+
+def add(total, batch):
+    """Sum of two additive aggregates (counts or sums), aligned on their labels."""
+    merged = total.add(batch, fill_value=0)
+    # Labels present on one side only come back as floats; counts stay integers
+    dtypes = [total.dtypes, batch.dtypes] if isinstance(total, pd.DataFrame) else [[total.dtype], [batch.dtype]]
+    if all(pd.api.types.is_integer_dtype(dtype) for side in dtypes for dtype in side):
+        merged = merged.astype('int64')
+    return merged
+
+
+def add_ranked(total, batch):
+    """``add`` for value_counts() results, kept in descending order of count."""
+    return add(total, batch).sort_values(ascending=False, kind='stable')
+
+
+def additive(measure):
+    """Mark a measure whose aggregate over two sets of rows is the sum of its aggregates."""
+    measure.merge = add
+    return measure
+
+
+def ranked(measure):
+    """Mark a value_counts() measure, merged like ``additive`` but kept ranked by count."""
+    measure.merge = add_ranked
+    return measure
+
+
+def ranked_counts(column):
+    """Measure counting each value of ``column``, most frequent first."""
+    return ranked(lambda frame: frame[column].value_counts())
+
+
+class Cube:
+    """Every chart aggregate of a page, materialised for every filter combination.
+
+    ``measures`` maps a name to a function computing one chart's aggregate from a
+    filtered frame. The cube evaluates each of them once per combination of the
+    index's filter values, 'All' included as the rollup, so callbacks only do a
+    dictionary lookup.
+
+    When every measure is ``additive`` (or ``ranked``), a cube built from a batch of
+    new rows can be merged into the cube of the rows before it, see ``merged``.
+    """
+
+    def __init__(self, frame, index, measures):
+        self.measures = dict(measures)
+        self.names = list(index.columns)
+        # No rows at all: what every filter value outside the survey aggregates. A copy, as
+        # a view would keep the whole frame alive after a newer version replaced it
+        self.empty = frame.iloc[:0].copy()
+        self.cells = {}
+        values = [[ALL] + list(index.bitmaps[name]) for name in self.names]
+        for key in itertools.product(*values):
+            filtered = index.take(frame, **dict(zip(self.names, key)))
+            self.cells[key] = self._aggregate(filtered)
+
+    def _aggregate(self, filtered):
+        # One aggregate per chart, computed side by side on the shared pool
+        return run({name: (lambda measure=measure: measure(filtered)) for name, measure in self.measures.items()})
+
+    @property
+    def mergeable(self):
+        return all(hasattr(measure, 'merge') for measure in self.measures.values())
+
+    def merged(self, batch):
+        """Cube over this cube's rows plus the rows ``batch`` was built from.
+
+        ``batch`` is a cube with the same measures built from new rows only, so the
+        cost follows the size of the batch and of the aggregates, never the rows
+        already counted.
+        """
+        if not self.mergeable:
+            raise TypeError("cube has measures that cannot be merged")
+        cube = copy.copy(self)
+        cube.cells = {}
+        # A combination missing on one side has no rows there
+        empty = self._aggregate(self.empty)
+        for key in self.cells.keys() | batch.cells.keys():
+            before = self.cells.get(key, empty)
+            after = batch.cells.get(key, empty)
+            cube.cells[key] = {name: measure.merge(before[name], after[name])
+                               for name, measure in self.measures.items()}
+        return cube
+
+    def get(self, **selected):
+        """The aggregates for the selected filter values, keyed by measure name."""
+        key = tuple(ALL if selected.get(name) is None else selected[name] for name in self.names)
+        cell = self.cells.get(key)
+        if cell is None:
+            # Values outside the survey are not materialised; they aggregate an empty selection
+            cell = self._aggregate(self.empty)
+        return cell
@@ -0,0 +1,626 @@
+import hashlib
+import itertools
+import logging
+import os
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow is optional; without it the apps parse the CSV copy
+    pa = feather = None
+
+# Text columns of a snapshot stay in its Arrow buffers instead of becoming object arrays
+try:
+    _string_dtype = pd.StringDtype('pyarrow', na_value=np.nan)
+except TypeError:  # pandas < 2.3
+    try:
+        _string_dtype = pd.StringDtype('pyarrow_numpy')
+    except (TypeError, ValueError):  # pandas < 2.1: text columns are copied
+        _string_dtype = None
+
+logger = logging.getLogger(__name__)
+
+# Source of the survey data shared by every dashboard
+url = "https://raw.githubusercontent.com/mamunalbd4/asharalo/main/asharalofinal.csv"
+
+# Local copy of the survey, revalidated against the source with ETag / Last-Modified
+cache_dir = os.environ.get('ASHARALO_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'asharalo'))
+cache_file = os.path.join(cache_dir, 'asharalofinal.csv')
+etag_file = cache_file + '.etag'
+checked_file = cache_file + '.checked'
+
+# Typed, uncompressed Arrow/Feather snapshot of the CSV, memory-mapped by the apps
+snapshot_file = os.path.join(cache_dir, 'asharalofinal.arrow')
+
+# The refresher revalidates a local copy last checked longer ago than this. Startup
+# always serves an existing local copy as is, so it only ever reads a local file.
+max_age = int(os.environ.get('ASHARALO_CACHE_MAX_AGE', 3600))
+
+# Keep the remote check short so a slow network never stalls the refresher
+timeout = float(os.environ.get('ASHARALO_FETCH_TIMEOUT', 5))
+
+# Seconds between background checks for a new survey version (0 disables the refresher)
+refresh_interval = float(os.environ.get('ASHARALO_REFRESH_INTERVAL', 300))
+
+# Directory polled for replacement survey CSVs, e.g. exports copied in by hand
+drop_dir = os.environ.get('ASHARALO_DROP_DIR')
+
+# Directory polled for batches of new records, appended on top of the local copy in name
+# order. Batches stay in place so every worker (and every restart) applies the same ones;
+# remove them once a full export containing their records replaces the local copy.
+append_dir = os.environ.get('ASHARALO_APPEND_DIR')
+
+# Declared dtypes for the columns the dashboards filter on. Stored as categoricals, each
+# filter becomes an integer compare on the category codes instead of a string compare.
+schema = {
+    'District': 'category',
+    'Upazilla': 'category',
+    'Union': 'category',
+    'Name of the village': 'category',
+    'Gender': 'category',
+    'Have a disability golden citizen card?': 'category',
+    'Is the person Skilled?': 'category',
+}
+
+# Columns the dashboards read; any other column of an export is skipped while parsing
+columns = [
+    'District', 'Upazilla', 'Union', 'Name of the village',
+    'Name of child / person', 'Age', "Father's name of the child / person", 'Mother name of the child / person',
+    'Gender', 'Have a disability golden citizen card?', 'Is the person Skilled?',
+    'Family monthly income?', 'Specify the main occupation of the family', 'Total number of family members',
+    "Person's monthly income?", "Person's occupation?", 'Age for Occ',
+    'Does the child / person go to school / study?',
+    'Educational Qualification of the child / individual (Enter the class he / she is passing at last):',
+    'If yes, what kind of school do you go to?',
+    'Has the Children/Person get Education stipend ',
+    'Has the Children/Person get Disability/Other Allowens',
+    'Has the Children/Person get Health sevices ( Govt./ Non- Govt. )',
+    'Has the Children/Person get Training service',
+    'Has the Children/Person get Rehabilitation allowance ',
+    'Has the Children/Person get Rehabilition Service (Govt. or Private)',
+    'In health rehabilitation service did you get Asisstive devices?',
+    'In health rehabilitation service did you get Therapy',
+    'In health rehabilitation service did you get Operation',
+    'In health rehabilitation service did you get Both (Asisstive device and Therapy) ',
+]
+
+# Rows parsed at a time, so only one chunk of a large export is ever held as raw text
+chunk_rows = int(os.environ.get('ASHARALO_CHUNK_ROWS', 100000))
+
+_current = None
+_swap_lock = threading.Lock()
+_update_lock = threading.Lock()
+_refresher_pid = None
+_missing = object()
+
+
+def _read_etag():
+    try:
+        with open(etag_file) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_atomic(path, payload):
+    # Write next to the target and rename, so concurrent workers never see a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+def refresh_cache(builders=()):
+    """Revalidate the local copy against the source; returns the Dataset of a replacing copy, None otherwise.
+
+    A new copy is downloaded next to the local one and only replaces it once it
+    parsed and validated; ``builders`` are derived as it is parsed.
+    """
+    request = urllib.request.Request(url)
+    if os.path.exists(cache_file):
+        etag = _read_etag()
+        if etag:
+            request.add_header('If-None-Match', etag)
+        request.add_header('If-Modified-Since', time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(_mtime(cache_file))))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+    downloaded = False
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response, open(tmp_path, 'wb') as f:
+            # Straight to disk a block at a time, so the download never sits in memory whole
+            shutil.copyfileobj(response, f)
+            etag = response.headers.get('ETag')
+        downloaded = True
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            raise
+    finally:
+        if not downloaded and os.path.exists(tmp_path):
+            # Interrupted download: drop the partial file
+            os.remove(tmp_path)
+
+    dataset = None
+    if downloaded:
+        try:
+            dataset = _adopt(tmp_path, builders)
+        except (ValueError, pd.errors.ParserError):
+            # Keep the local copy, and do not download the rejected one again before max_age
+            _write_atomic(checked_file, b'')
+            raise
+        finally:
+            # Left behind only when the copy was not adopted
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        if etag:
+            _write_atomic(etag_file, etag.encode())
+    # Record the successful check without touching the CSV, so the snapshot stays valid on a 304
+    _write_atomic(checked_file, b'')
+    return dataset
+
+
+def ensure_cache():
+    """Make sure a local copy exists; the source is only contacted when there is none yet."""
+    if not os.path.exists(cache_file):
+        refresh_cache()
+    return cache_file
+
+
+def revalidate_cache(builders=()):
+    """Revalidate the local copy against the source once it is older than ``max_age``.
+
+    Returns the Dataset of the copy that replaced it, None if it was kept.
+    """
+    if time.time() - max(_mtime(checked_file), _mtime(cache_file)) > max_age:
+        try:
+            return refresh_cache(builders)
+        except (OSError, urllib.error.URLError):
+            # Source unreachable: keep serving the stale copy
+            pass
+        except (ValueError, pd.errors.ParserError) as e:
+            logger.warning("Rejected downloaded survey: %s", e)
+    return None
+
+
+def read_chunks(path, chunksize=None):
+    """Parse the survey CSV ``chunksize`` rows at a time, keeping only ``columns``.
+
+    Each chunk is typed as it is parsed (the filter columns become categoricals), so
+    the text of a chunk is released before the next one is read.
+    """
+    with pd.read_csv(path, usecols=lambda column: column in columns, dtype=schema,
+                     chunksize=chunksize or chunk_rows) as reader:
+        yield from reader
+
+
+def read_csv(path):
+    return concat(read_chunks(path))
+
+
+def apply_schema(frame):
+    # Snapshots written before a column joined the schema are converted on load
+    missing = {column: dtype for column, dtype in schema.items()
+               if column in frame and not isinstance(frame[column].dtype, pd.CategoricalDtype)}
+    return frame.astype(missing) if missing else frame
+
+
+def concat(frames):
+    """Rows of ``frames`` in order, with each categorical column over the sorted union of their categories."""
+    frames = list(frames)
+    if len(frames) == 1:
+        return frames[0]
+    dtypes = {}
+    for column in frames[0].columns:
+        if all(isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames if column in frame):
+            categories = frames[0][column].cat.categories
+            for frame in frames[1:]:
+                categories = categories.union(frame[column].cat.categories, sort=False)
+            # Sorted like the categories read_csv infers, so sorting a column stays alphabetical
+            dtypes[column] = pd.CategoricalDtype(categories.sort_values())
+    frames = [frame.astype({column: dtype for column, dtype in dtypes.items() if column in frame}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def equals(series, value):
+    """Boolean mask for ``series == value``, compared on the integer category codes."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return (series == value).to_numpy()
+    code = series.cat.categories.get_indexer([value])[0]
+    if code < 0:
+        # Value never seen in the survey: nothing matches
+        return np.zeros(len(series), dtype=bool)
+    return series.cat.codes.to_numpy() == code
+
+
+def isin(series, values):
+    """Boolean mask for ``series.isin(values)``, compared on the integer category codes."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.isin(values).to_numpy()
+    codes = series.cat.categories.get_indexer(list(values))
+    return np.isin(series.cat.codes.to_numpy(), codes[codes >= 0])
+
+
+def value_counts(series):
+    """``series.value_counts()`` without the zero rows categoricals report for unused categories."""
+    counts = series.value_counts()
+    return counts[counts > 0]
+
+
+def source_version(path):
+    """Identifier of one copy of the survey file; changes whenever the file is replaced."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}-{stat.st_ino:x}"
+
+
+def write_snapshot(csv_path=None, path=None):
+    """Convert the CSV copy into the columnar snapshot the apps memory-map."""
+    csv_path = csv_path or ensure_cache()
+    return _write_snapshot(read_csv(csv_path), source_version(csv_path), path)
+
+
+def _write_snapshot(frame, version, path=None):
+    path = path or snapshot_file
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    # Record which copy of the CSV the snapshot was built from
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'asharalo_version': version.encode()})
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Uncompressed and in a single chunk, so every column can be mapped straight into memory
+    feather.write_feather(table, tmp_path, compression='uncompressed', chunksize=max(table.num_rows, 1))
+    os.replace(tmp_path, path)
+    return path
+
+
+def _string_type(arrow_type):
+    if _string_dtype is not None and arrow_type in (pa.string(), pa.large_string()):
+        return _string_dtype
+    return None
+
+
+def _read_snapshot(version):
+    try:
+        table = feather.read_table(snapshot_file, memory_map=True)
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if (table.schema.metadata or {}).get(b'asharalo_version') != version.encode():
+        return None
+    # Numbers and text keep pointing into the mapped file rather than being copied into
+    # private pandas blocks, so every worker mapping the snapshot shares its pages
+    return apply_schema(table.to_pandas(split_blocks=True, self_destruct=True, types_mapper=_string_type))
+
+
+def read_dataset(csv_path, builders=()):
+    """Parse one copy of the survey into a new Dataset, through the snapshot when pyarrow is installed.
+
+    When the CSV has to be parsed, ``builders`` are derived chunk by chunk as it streams in.
+    """
+    version = source_version(csv_path)
+    if feather is not None:
+        frame = _read_snapshot(version)
+        if frame is not None:
+            return Dataset(frame, version)
+    return _mapped(stream_dataset(read_chunks(csv_path), version, builders))
+
+
+def _mapped(dataset):
+    if feather is None:
+        return dataset
+    _write_snapshot(dataset.frame, dataset.version)
+    # Serve the mapped snapshot rather than the parsed copy, which is then released
+    frame = _read_snapshot(dataset.version)
+    if frame is None:
+        return dataset
+    mapped = Dataset(frame, dataset.version)
+    mapped._derived.update(dataset._derived)
+    return mapped
+
+
+def _adopt(path, builders=()):
+    # Parse a new copy lying next to the local one and rename it over the local copy only
+    # once it validated; the rename keeps its mtime, size and inode, and so its version
+    version = source_version(path)
+    chunks = read_chunks(path)
+    # Validate the first chunk before any builder sees it; the others have the same columns
+    first = next(chunks, None)
+    validate(Dataset(pd.DataFrame() if first is None else first, version))
+    try:
+        dataset = stream_dataset(itertools.chain([first], chunks), version, builders)
+    except (OSError, ValueError):
+        raise
+    except Exception as e:
+        # A builder failing on the copy rejects it like a failed validation
+        raise ValueError(f"survey copy could not be built: {e!r}") from e
+    os.replace(path, cache_file)
+    return _mapped(dataset)
+
+
+def _mergeable(value):
+    return hasattr(value, 'merged') and getattr(value, 'mergeable', True)
+
+
+def stream_dataset(chunks, version, builders=()):
+    """Dataset from an iterable of frames, deriving each of ``builders`` as the chunks arrive.
+
+    Builders whose values merge (cubes, the location tree) are built per chunk and
+    merged, so no aggregate needs a second pass over the rows; the others are
+    derived from the whole frame when first used.
+    """
+    frames, derived = [], {}
+    builders = list(builders)
+    for chunk in chunks:
+        for builder in list(builders):
+            value = builder(chunk)
+            if not _mergeable(value):
+                builders.remove(builder)
+                derived.pop(builder, None)
+            elif builder in derived:
+                derived[builder] = derived[builder].merged(value)
+            else:
+                derived[builder] = value
+        frames.append(chunk)
+    dataset = Dataset(concat(frames), version)
+    dataset._derived.update(derived)
+    return dataset
+
+
+class Dataset:
+    """One immutable version of the survey, plus everything derived from it.
+
+    Callbacks take the current Dataset once and use only it, so a request that is
+    running while a new version is swapped in finishes on the version it started with.
+
+    A version is a parsed copy of the survey plus any batches of new records appended
+    on top of it (see ``append``).
+    """
+
+    def __init__(self, frame, version, batches=(), pending=()):
+        self.base_version = version
+        # (name, rows) of each batch appended to the parsed copy, oldest first
+        self.batches = tuple(batches)
+        self.version = version
+        if self.batches:
+            # Which batches were applied, in which order and with how many rows each
+            self.version = f"{version}+{hashlib.sha1(repr(self.batches).encode()).hexdigest()[:12]}"
+        self.columns = frame.columns
+        self.rows = len(frame) + sum(len(batch) for batch in pending)
+        self.loaded_at = time.time()
+        # After an append, the previous version's records and the ``pending`` batch frames,
+        # concatenated into the frame on first use and released once it is built
+        self._frame = None if pending else frame
+        self._parts = [frame, *pending] if pending else None
+        self._derived = {}
+        self._lock = threading.Lock()
+        # Separate from _lock: derive() holds that one while a builder reads the frame
+        self._frame_lock = threading.Lock()
+
+    @property
+    def frame(self):
+        """Every record of this version; after an append, concatenated on first use."""
+        if self._frame is None:
+            with self._frame_lock:
+                if self._frame is None:
+                    self._frame = concat(self._parts)
+                    self._parts = None
+        return self._frame
+
+    def batch_names(self):
+        return [name for name, _ in self.batches]
+
+    def append(self, batch, name=None):
+        """New version with the records of ``batch`` added after this one's.
+
+        Derived values that can merge (``merged(builder(batch))``, e.g. cubes and the
+        location tree) are carried over by building them from the batch alone, so the
+        update costs time in proportion to the batch. Anything else is rebuilt from
+        the combined frame when next derived.
+        """
+        missing = [column for column in self.columns if column not in batch]
+        if missing:
+            raise ValueError(f"survey batch is missing columns: {', '.join(missing)}")
+        if batch.empty:
+            raise ValueError("survey batch has no rows")
+        batch = apply_schema(batch[list(self.columns)].reset_index(drop=True))
+        name = name or f"batch-{len(self.batches) + 1}"
+        with self._frame_lock:
+            # Start from this version's frame once it is built, so only the batch is added to it
+            parts = [self._frame] if self._frame is not None else self._parts
+        dataset = Dataset(parts[0], self.base_version, self.batches + ((name, len(batch)),), [*parts[1:], batch])
+        for builder, value in list(self._derived.items()):
+            if _mergeable(value):
+                dataset._derived[builder] = value.merged(builder(batch))
+        return dataset
+
+    def derive(self, builder):
+        """``builder(frame)``, built once per version and shared by every caller."""
+        value = self._derived.get(builder, _missing)
+        if value is _missing:
+            with self._lock:
+                value = self._derived.get(builder, _missing)
+                if value is _missing:
+                    value = self._derived[builder] = builder(self.frame)
+        return value
+
+    def builders(self):
+        """The builders derived from this version so far."""
+        return list(self._derived)
+
+
+def validate(dataset):
+    """Raise ValueError if a freshly parsed survey copy is not fit to replace the current one."""
+    # Appended batches are checked against the base copy by Dataset.append
+    missing = [column for column in columns if column not in dataset.columns]
+    if missing:
+        raise ValueError(f"survey copy is missing columns: {', '.join(missing)}")
+    if not dataset.rows:
+        raise ValueError("survey copy has no rows")
+
+
+def current():
+    """The Dataset currently served, loaded on first use."""
+    global _current
+    if _current is None:
+        with _swap_lock:
+            if _current is None:
+                _current = read_dataset(ensure_cache())
+    return _current
+
+
+def swap(dataset):
+    """Atomically make ``dataset`` the version served to new requests."""
+    global _current
+    validate(dataset)
+    with _swap_lock:
+        _current = dataset
+    return dataset
+
+
+def load_data():
+    """Return the current survey DataFrame, shared by all apps."""
+    return current().frame
+
+
+def dataset_version():
+    """Identifier of the survey version currently served."""
+    return current().version
+
+
+def _dropped_file():
+    # Newest CSV waiting in the drop directory, if any
+    try:
+        names = [name for name in os.listdir(drop_dir) if name.endswith('.csv')]
+    except OSError:
+        return None
+    paths = [os.path.join(drop_dir, name) for name in names]
+    return max(paths, key=_mtime) if paths else None
+
+
+def append(batch, name=None):
+    """Append a DataFrame of new records to the served survey of this process; returns the new version.
+
+    Records appended here are dropped when the local copy is replaced; batches that must
+    reach every worker and survive restarts belong in the append directory.
+    """
+    with _update_lock:
+        dataset = current().append(batch, name)
+        # Concatenate the new frame here rather than in the next request
+        dataset.frame
+        return swap(dataset)
+
+
+def _batch_files():
+    # Batches waiting in the append directory, in the order they are applied
+    try:
+        names = sorted(name for name in os.listdir(append_dir) if name.endswith('.csv'))
+    except OSError:
+        return []
+    return [os.path.join(append_dir, name) for name in names]
+
+
+def _append_batches(dataset):
+    # Apply the batches this version does not contain yet; copy them in with a rename
+    applied = set(dataset.batch_names())
+    for path in _batch_files():
+        name = os.path.basename(path)
+        if name in applied:
+            continue
+        try:
+            dataset = dataset.append(read_csv(path), name)
+        except (OSError, ValueError, pd.errors.ParserError) as e:
+            logger.warning("Rejected survey batch %s: %s", path, e)
+            try:
+                os.replace(path, path + '.rejected')
+            except OSError:
+                pass  # already handled by another worker
+    return dataset
+
+
+def _adopt_dropped(dropped, builders):
+    # Take the dropped copy next to the local one first, so adopting it is a rename
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        shutil.move(dropped, tmp_path)
+    except FileNotFoundError:
+        return None  # another worker adopted it first
+    try:
+        return _adopt(tmp_path, builders)
+    except (OSError, ValueError, pd.errors.ParserError) as e:
+        logger.warning("Rejected dropped survey %s: %s", dropped, e)
+        try:
+            shutil.move(tmp_path, dropped + '.rejected')
+        except OSError:
+            pass  # left in the cache directory
+        return None
+
+
+def check_for_update():
+    """Pick up a dropped or revalidated survey copy and new batches; returns True if a new version was swapped in."""
+    # Build the new version's indexes and cubes while it is parsed, off the request path
+    builders = current().builders()
+    dropped = _dropped_file() if drop_dir else None
+    fresh = _adopt_dropped(dropped, builders) if dropped is not None else None
+    fresh = revalidate_cache(builders) or fresh
+    with _update_lock:
+        served = current()
+        dataset = served
+        try:
+            if fresh is not None:
+                dataset = fresh
+            elif served.base_version != source_version(cache_file):
+                # Another worker replaced the local copy
+                dataset = read_dataset(cache_file, served.builders())
+                validate(dataset)
+        except (OSError, ValueError, pd.errors.ParserError) as e:
+            logger.warning("Keeping survey version %s: %s", served.version, e)
+        if append_dir:
+            dataset = _append_batches(dataset)
+        if dataset is served:
+            return False
+        # Build the frame and whatever the batches could not carry over here, off the request path
+        dataset.frame
+        for builder in served.builders():
+            dataset.derive(builder)
+        swap(dataset)
+    logger.info("Swapped in survey version %s", dataset.version)
+    return True
+
+
+def _refresh_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            check_for_update()
+        except Exception:
+            logger.exception("Survey refresh failed")
+
+
+def start_refresher(interval=None):
+    """Poll the source, the drop directory and the append directory in a background thread of this process.
+
+    Call it in each serving process (e.g. gunicorn's post_fork hook); threads do not
+    survive the fork from a preloading master.
+    """
+    global _refresher_pid
+    interval = refresh_interval if interval is None else interval
+    if interval <= 0 or _refresher_pid == os.getpid():
+        return
+    _refresher_pid = os.getpid()
+    threading.Thread(target=_refresh_loop, args=(interval,), name='asharalo-refresh', daemon=True).start()
+
+
+if __name__ == '__main__':
+    print(write_snapshot())
@@ -2,75 +2,103 @@ import dash
 import dash_core_components as dcc
 import dash_html_components as html
 import plotly.express as px
-import pandas as pd
 from dash.dependencies import Input, Output
-
-# Load data from the URL
-url = "https://raw.githubusercontent.com/mamunalbd4/asharalo/main/asharalofinal.csv"
-data = pd.read_csv(url)
+from asharalo_cache import figure_cache
+from asharalo_cube import Cube, ranked_counts
+from asharalo_data import current
+from asharalo_index import FilterIndex
+from asharalo_json import array
+from asharalo_metrics import lap, metrics
+from asharalo_server import dash_kwargs, register_http
 
 # Create the Dash App
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, **dash_kwargs('/education/'))
 server=app.server
+register_http(server)
+figure_cache.register(server)
+metrics.register(server)
 
 # Define the available options for the dropdown
-gender_options = [{'label': 'All', 'value': 'All'}] + [{'label': gender, 'value': gender} for gender in data['Gender'].unique()]
-disability_options = [{'label': 'All', 'value': 'All'}] + [{'label': option, 'value': option} for option in data['Have a disability golden citizen card?'].unique()]
-
-# Filter out "Not Applicable" values from the initial data
-data_filtered = data[(data["Does the child / person go to school / study?"] != "Not Applicable") &
-                     (data["Educational Qualification of the child / individual (Enter the class he / she is passing at last):"] != "Not Applicable") &
-                     (data["If yes, what kind of school do you go to?"] != "Not Applicable") &
-                     (data["Has the Children/Person get Education stipend "] != "Not Applicable")]
-
-app.layout = html.Div([
-    html.H1(
-        "Ashar Alo Project Education Summary",
-        style={'text-align': 'center', 'margin-top': '20px'}),  # Center the heading horizontally and add margin at the top
-
-    html.Div([
-        html.Label("Filter by Gender:"),
-        dcc.Dropdown(
-            id='gender-dropdown',
-            options=gender_options,
-            value='All'
+def dropdown_options(data):
+    gender_options = [{'label': 'All', 'value': 'All'}] + [{'label': gender, 'value': gender} for gender in data['Gender'].unique()]
+    disability_options = [{'label': 'All', 'value': 'All'}] + [{'label': option, 'value': option} for option in data['Have a disability golden citizen card?'].unique()]
+    return gender_options, disability_options
+
+# Counts for one version of the data from the shared survey loader
+def build_cube(data):
+    # Filter out "Not Applicable" values from the initial data
+    data_filtered = data[(data["Does the child / person go to school / study?"] != "Not Applicable") &
+                         (data["Educational Qualification of the child / individual (Enter the class he / she is passing at last):"] != "Not Applicable") &
+                         (data["If yes, what kind of school do you go to?"] != "Not Applicable") &
+                         (data["Has the Children/Person get Education stipend "] != "Not Applicable")]
+
+    # Row bitmaps for the gender and disability card dropdowns over the filtered data
+    index = FilterIndex(data_filtered, {'gender': 'Gender', 'disability': 'Have a disability golden citizen card?'})
+
+    # Counts behind every chart, precomputed for every dropdown combination ('All' included)
+    return Cube(data_filtered, index, {
+        'school_counts': ranked_counts("Does the child / person go to school / study?"),
+        'qualification_counts': ranked_counts("Educational Qualification of the child / individual (Enter the class he / she is passing at last):"),
+        'school_type_counts': ranked_counts("If yes, what kind of school do you go to?"),
+        'stipend_counts': ranked_counts("Has the Children/Person get Education stipend "),
+    })
+
+# Load the data and build its counts before serving; a newer version gets its own cube
+current().derive(build_cube)
+
+# Layout, rebuilt on every page load so the dropdown options follow the current data
+def serve_layout():
+    gender_options, disability_options = current().derive(dropdown_options)
+    return html.Div([
+        html.H1(
+            "Ashar Alo Project Education Summary",
+            style={'text-align': 'center', 'margin-top': '20px'}),  # Center the heading horizontally and add margin at the top
+
+        html.Div([
+            html.Label("Filter by Gender:"),
+            dcc.Dropdown(
+                id='gender-dropdown',
+                options=gender_options,
+                value='All'
+            ),
+        ], style={'width': '45%', 'display': 'inline-block', 'margin-top': '20px', 'margin-left': '10%'}),
+
+        html.Div([
+            html.Label("Filter by Disability/Golden Citizen Card:"),
+            dcc.Dropdown(
+                id='disability-dropdown',
+                options=disability_options,
+                value='All'
+            ),
+        ], style={'width': '45%', 'display': 'inline-block', 'margin-top': '20px'}),
+
+        dcc.Graph(
+            id='school-bar-chart',
+            style={'margin-top': '20px'}
         ),
-    ], style={'width': '45%', 'display': 'inline-block', 'margin-top': '20px', 'margin-left': '10%'}),
-
-    html.Div([
-        html.Label("Filter by Disability/Golden Citizen Card:"),
-        dcc.Dropdown(
-            id='disability-dropdown',
-            options=disability_options,
-            value='All'
+
+        dcc.Graph(
+            id='qualification-pie-chart',
+            style={'margin-top': '20px'}
         ),
-    ], style={'width': '45%', 'display': 'inline-block', 'margin-top': '20px'}),
-
-    dcc.Graph(
-        id='school-bar-chart',
-        style={'margin-top': '20px'}
-    ),
-
-    dcc.Graph(
-        id='qualification-pie-chart',
-        style={'margin-top': '20px'}
-    ),
-
-    dcc.Graph(
-        id='school-type-bar-chart',
-        style={'margin-top': '20px'}
-    ),
-
-    dcc.Graph(
-        id='stipend-bar-chart',
-        style={'margin-top': '20px'}
-    ),
-
-    dcc.Graph(
-        id='stipend-pie-chart',
-        style={'margin-top': '20px'}
-    )
-])
+
+        dcc.Graph(
+            id='school-type-bar-chart',
+            style={'margin-top': '20px'}
+        ),
+
+        dcc.Graph(
+            id='stipend-bar-chart',
+            style={'margin-top': '20px'}
+        ),
+
+        dcc.Graph(
+            id='stipend-pie-chart',
+            style={'margin-top': '20px'}
+        )
+    ])
+
+app.layout = serve_layout
 
 # Create a callback to update all charts based on the selected options
 @app.callback(
@@ -82,48 +110,47 @@ app.layout = html.Div([
     [Input('gender-dropdown', 'value'),
      Input('disability-dropdown', 'value')]
 )
+@metrics.instrument
+@figure_cache.memoize
 def update_charts(selected_gender, selected_disability):
-    # Filter data based on selected options and exclude "Not Applicable"
-    filtered_data = data_filtered.copy()
-    
-    if selected_gender != 'All':
-        filtered_data = filtered_data[filtered_data['Gender'] == selected_gender]
-    
-    if selected_disability != 'All':
-        filtered_data = filtered_data[filtered_data['Have a disability golden citizen card?'] == selected_disability]
-
-    # Recalculate counts for all charts
-    school_counts = filtered_data["Does the child / person go to school / study?"].value_counts()
-    qualification_counts = filtered_data["Educational Qualification of the child / individual (Enter the class he / she is passing at last):"].value_counts()
-    school_type_counts = filtered_data["If yes, what kind of school do you go to?"].value_counts()
-    stipend_counts = filtered_data["Has the Children/Person get Education stipend "].value_counts()
+    # Look up the counts precomputed for the selected options ("Not Applicable" already excluded)
+    cube = current().derive(build_cube)
+    aggregates = cube.get(gender=selected_gender, disability=selected_disability)
+    lap('aggregate')
+
+    # Counts for all charts
+    school_counts = aggregates['school_counts']
+    qualification_counts = aggregates['qualification_counts']
+    school_type_counts = aggregates['school_type_counts']
+    stipend_counts = aggregates['stipend_counts']
 
     # Create figures for all charts
     school_bar_chart = {
-        'data': [{'x': school_counts.index, 'y': school_counts.values, 'type': 'bar', 'name': 'School Attendance'}],
+        'data': [{'x': array(school_counts.index), 'y': array(school_counts), 'type': 'bar', 'name': 'School Attendance'}],
         'layout': {'title': 'Does the child/person go to school/study?'}
     }
 
     qualification_pie_chart = {
-        'data': [{'labels': qualification_counts.index, 'values': qualification_counts.values, 'type': 'pie', 'name': 'Educational Qualification'}],
+        'data': [{'labels': array(qualification_counts.index), 'values': array(qualification_counts), 'type': 'pie', 'name': 'Educational Qualification'}],
         'layout': {'title': 'Educational Qualification of the child/individual'}
     }
 
     school_type_bar_chart = {
-        'data': [{'x': school_type_counts.index, 'y': school_type_counts.values, 'type': 'bar', 'name': 'School Type'}],
+        'data': [{'x': array(school_type_counts.index), 'y': array(school_type_counts), 'type': 'bar', 'name': 'School Type'}],
         'layout': {'title': 'Types of Schools Attended'}
     }
 
     stipend_bar_chart = {
-        'data': [{'x': stipend_counts.index, 'y': stipend_counts.values, 'type': 'bar', 'name': 'Stipend Status'}],
+        'data': [{'x': array(stipend_counts.index), 'y': array(stipend_counts), 'type': 'bar', 'name': 'Stipend Status'}],
         'layout': {'title': 'Education Stipend Status'}
     }
 
     stipend_pie_chart = {
-        'data': [{'labels': stipend_counts.index, 'values': stipend_counts.values, 'type': 'pie', 'name': 'Stipend Status'}],
+        'data': [{'labels': array(stipend_counts.index), 'values': array(stipend_counts), 'type': 'pie', 'name': 'Stipend Status'}],
         'layout': {'title': 'Education Stipend Status'}
     }
 
+    lap('figure')
     return school_bar_chart, qualification_pie_chart, school_type_bar_chart, stipend_bar_chart, stipend_pie_chart
 
 if __name__ == '__main__':
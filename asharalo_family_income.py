@@ -1,21 +1,43 @@
-import pandas as pd
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
 from dash.dependencies import Input, Output
-import plotly.graph_objs as go
-import plotly.express as px
-
-# 1. Load the data
-data = pd.read_csv('https://raw.githubusercontent.com/mamunalbd4/asharalo/main/asharalofinal.csv')
+from asharalo_cache import figure_cache
+from asharalo_cube import Cube, additive, ranked_counts
+from asharalo_data import current
+from asharalo_figures import grouped_bar
+from asharalo_index import FilterIndex
+from asharalo_json import array
+from asharalo_metrics import lap, metrics
+from asharalo_server import dash_kwargs, register_http
+
+# 1. Aggregates for one version of the data
+def build_cube(data):
+    # Row bitmaps for the Gender / disability card dropdowns
+    index = FilterIndex(data, {'gender': 'Gender', 'disability': 'Have a disability golden citizen card?'})
+
+    # Aggregates behind each chart, precomputed for every dropdown combination ('All' included).
+    # All of them are counts or sums, so new batches of records merge in (see Dataset.append)
+    return Cube(data, index, {
+        'income_counts': ranked_counts('Family monthly income?'),
+        'occupation_counts': ranked_counts('Specify the main occupation of the family'),
+        'grouped_data': additive(lambda filtered_data: filtered_data.groupby(['Specify the main occupation of the family', 'Family monthly income?']).size()),
+        'occupation_total_members': additive(lambda filtered_data: filtered_data.groupby('Specify the main occupation of the family')['Total number of family members'].sum()),
+    })
+
+# Load the data and build its aggregates before serving; a newer version gets its own cube
+current().derive(build_cube)
 
 colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf']
 
 chart_height = 600
 
 # 9. Create the Dash app
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, **dash_kwargs('/family-income/'))
 server=app.server
+register_http(server)
+figure_cache.register(server)
+metrics.register(server)
 
 app.layout = html.Div([
     html.H1("Ashar Alo Project Income Situation", style={'textAlign': 'center'}),
@@ -79,121 +101,84 @@ app.layout = html.Div([
 
 ])
 
+# Update all charts from a single lookup of the selected filters
 @app.callback(
-    Output('family-income-pie-chart', 'figure'),
-    Input('gender-dropdown', 'value'),
-    Input('disability-dropdown', 'value')
+    [Output('occupation-bar-chart', 'figure'),
+     Output('family-income-pie-chart', 'figure'),
+     Output('grouped-bar-chart', 'figure'),
+     Output('occupation-total-members-bar-chart', 'figure')],
+    [Input('gender-dropdown', 'value'),
+     Input('disability-dropdown', 'value')]
 )
-def update_family_income_pie_chart(selected_gender, selected_disability):
-    if selected_gender != 'All':
-        filtered_data = data[data['Gender'] == selected_gender]
-    else:
-        filtered_data = data.copy()
-    
-    if selected_disability != 'All':
-        filtered_data = filtered_data[filtered_data['Have a disability golden citizen card?'] == selected_disability]
-    
-    income_counts = filtered_data['Family monthly income?'].value_counts()
+@metrics.instrument
+@figure_cache.memoize
+def update_charts(selected_gender, selected_disability):
+    cube = current().derive(build_cube)
+    aggregates = cube.get(gender=selected_gender, disability=selected_disability)
+    lap('aggregate')
     
-    return {
+    occupation_counts = aggregates['occupation_counts']
+    income_counts = aggregates['income_counts']
+    grouped_data = aggregates['grouped_data'].reset_index(name='Count')
+    occupation_total_members = aggregates['occupation_total_members'].reset_index()
+
+    occupation_chart = {
         'data': [
-            go.Pie(
-                labels=income_counts.index,
-                values=income_counts.values,
-                marker={'colors': colors},
-                textinfo='percent+label',
-                hole=0.3
-            )
+            {
+                'type': 'bar',
+                'x': array(occupation_counts.index),
+                'y': array(occupation_counts),
+                'marker': {'color': colors}
+            }
         ],
-        'layout': go.Layout(
-            title='Distribution of Family Monthly Income',
-            height=chart_height
-        )
+        'layout': {
+            'title': {'text': 'Main Occupation of Families'},
+            'xaxis': {'title': {'text': 'Occupation'}},
+            'yaxis': {'title': {'text': 'Count'}},
+            'hovermode': 'closest',
+            'height': chart_height
+        }
     }
 
-@app.callback(
-    Output('occupation-bar-chart', 'figure'),
-    Input('gender-dropdown', 'value'),
-    Input('disability-dropdown', 'value')
-)
-def update_occupation_chart(selected_gender, selected_disability):
-    if selected_gender != 'All':
-        filtered_data = data[data['Gender'] == selected_gender]
-    else:
-        filtered_data = data.copy()
-    
-    if selected_disability != 'All':
-        filtered_data = filtered_data[filtered_data['Have a disability golden citizen card?'] == selected_disability]
-    
-    occupation_counts = filtered_data['Specify the main occupation of the family'].value_counts()
-
-    return {
+    family_income_pie_chart = {
         'data': [
-            go.Bar(
-                x=occupation_counts.index,
-                y=occupation_counts.values,
-                marker={'color': colors}
-            )
+            {
+                'type': 'pie',
+                'labels': array(income_counts.index),
+                'values': array(income_counts),
+                'marker': {'colors': colors},
+                'textinfo': 'percent+label',
+                'hole': 0.3
+            }
         ],
-        'layout': go.Layout(
-            title='Main Occupation of Families',
-            xaxis={'title': 'Occupation'},
-            yaxis={'title': 'Count'},
-            hovermode='closest',
-            height=chart_height
-        )
+        'layout': {
+            'title': {'text': 'Distribution of Family Monthly Income'},
+            'height': chart_height
+        }
     }
 
-@app.callback(
-    Output('grouped-bar-chart', 'figure'),
-    Input('gender-dropdown', 'value'),
-    Input('disability-dropdown', 'value')
-)
-def update_grouped_bar_chart(selected_gender, selected_disability):
-    if selected_gender != 'All':
-        filtered_data = data[data['Gender'] == selected_gender]
-    else:
-        filtered_data = data.copy()
-    
-    if selected_disability != 'All':
-        filtered_data = filtered_data[filtered_data['Have a disability golden citizen card?'] == selected_disability]
-    
-    grouped_data = filtered_data.groupby(['Specify the main occupation of the family', 'Family monthly income?']).size().reset_index(name='Count')
-    
-    return px.bar(grouped_data, x='Specify the main occupation of the family', y='Count', color='Family monthly income?', barmode='group')
+    grouped_bar_chart = grouped_bar(grouped_data, 'Specify the main occupation of the family', 'Count', 'Family monthly income?')
 
-@app.callback(
-    Output('occupation-total-members-bar-chart', 'figure'),
-    Input('gender-dropdown', 'value'),
-    Input('disability-dropdown', 'value')
-)
-def update_occupation_total_members_chart(selected_gender, selected_disability):
-    if selected_gender != 'All':
-        filtered_data = data[data['Gender'] == selected_gender]
-    else:
-        filtered_data = data.copy()
-    
-    if selected_disability != 'All':
-        filtered_data = filtered_data[filtered_data['Have a disability golden citizen card?'] == selected_disability]
-    
-    occupation_total_members = filtered_data.groupby('Specify the main occupation of the family')['Total number of family members'].sum().reset_index()
-    
-    return {
+    occupation_total_members_chart = {
         'data': [
-            go.Bar(
-                x=occupation_total_members['Specify the main occupation of the family'],
-                y=occupation_total_members['Total number of family members'],
-                marker={'color': colors}
-            )
+            {
+                'type': 'bar',
+                'x': array(occupation_total_members['Specify the main occupation of the family']),
+                'y': array(occupation_total_members['Total number of family members']),
+                'marker': {'color': colors}
+            }
         ],
-        'layout': go.Layout(
-            title='Sum of Total Number of Family Members by Occupation',
-            xaxis={'title': 'Occupation'},
-            yaxis={'title': 'Total Number of Family Members'},
-            hovermode='closest',
-            height=chart_height
-        )
+        'layout': {
+            'title': {'text': 'Sum of Total Number of Family Members by Occupation'},
+            'xaxis': {'title': {'text': 'Occupation'}},
+            'yaxis': {'title': {'text': 'Total Number of Family Members'}},
+            'hovermode': 'closest',
+            'height': chart_height
+        }
     }
 
+    lap('figure')
+    return occupation_chart, family_income_pie_chart, grouped_bar_chart, occupation_total_members_chart
+
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -0,0 +1,116 @@
+"""Plain-dict figures for the hot callbacks, built straight from aggregate arrays.
+
+plotly express validates every property through the graph_objects classes and, for
+a discrete ``color``, splits the data into one trace per value. The charts here
+are tiny aggregates, so that overhead is almost all of a callback's time. These
+builders emit the same figures as JSON-ready dicts: bars coloured per category
+become a single trace with one colour per bar, and the template is converted once.
+"""
+import pandas as pd
+import plotly.io as pio
+
+from asharalo_json import array
+
+# The parts of plotly express's default template that bar and pie charts use, converted
+# to plain JSON once instead of being validated and serialized in full with every figure
+_default = pio.templates[pio.templates.default].to_plotly_json()
+template = {
+    'data': {kind: traces for kind, traces in _default.get('data', {}).items() if kind in ('bar', 'pie')},
+    'layout': {key: value for key, value in _default.get('layout', {}).items() if key in (
+        'autotypenumbers', 'colorway', 'colorscale', 'coloraxis', 'font', 'hoverlabel', 'hovermode',
+        'paper_bgcolor', 'plot_bgcolor', 'title', 'xaxis', 'yaxis')},
+}
+
+# Colours plotly express cycles through for discrete values, and its continuous scale
+colorway = template['layout'].get('colorway', ['#636efa', '#EF553B', '#00cc96', '#ab63fa', '#FFA15A'])
+colorscale = template['layout'].get('colorscale', {}).get('sequential')
+
+
+def _layout(title, x_title=None, y_title=None, height=None):
+    layout = {'template': template, 'legend': {'tracegroupgap': 0}}
+    if x_title is not None:
+        layout['xaxis'] = {'anchor': 'y', 'domain': [0.0, 1.0], 'title': {'text': x_title}}
+        layout['yaxis'] = {'anchor': 'x', 'domain': [0.0, 1.0], 'title': {'text': y_title}}
+        layout['barmode'] = 'relative'
+    if title is None:
+        layout['margin'] = {'t': 60}
+    else:
+        layout['title'] = {'text': title}
+    if height is not None:
+        layout['height'] = height
+    return layout
+
+
+def colors(count):
+    """One discrete colour per value, cycling through the template's colorway."""
+    return [colorway[i % len(colorway)] for i in range(count)]
+
+
+def bar(x, y, x_title, y_title, title=None, height=None):
+    """The figure of ``px.bar(frame, x=..., y=..., color=<the x column>)``.
+
+    Categorical bars are one trace with a colour per bar (the legend, which only
+    repeated the axis labels, is left out); numeric x values are coloured on the
+    continuous colour axis, as plotly express does.
+    """
+    x = pd.Index(x)
+    numeric = pd.api.types.is_numeric_dtype(x.dtype) and not pd.api.types.is_bool_dtype(x.dtype)
+    x = array(x)
+    trace = {
+        'type': 'bar',
+        'x': x,
+        'y': array(y),
+        'orientation': 'v',
+        'textposition': 'auto',
+        'showlegend': False,
+    }
+    layout = _layout(title, x_title, y_title, height)
+    if numeric:
+        trace['marker'] = {'color': x, 'coloraxis': 'coloraxis'}
+        trace['hovertemplate'] = f"{x_title}=%{{marker.color}}<br>{y_title}=%{{y}}<extra></extra>"
+        layout['coloraxis'] = {'colorbar': {'title': {'text': x_title}}, 'colorscale': colorscale}
+    else:
+        trace['marker'] = {'color': colors(len(x))}
+        trace['hovertemplate'] = f"{x_title}=%{{x}}<br>{y_title}=%{{y}}<extra></extra>"
+    return {'data': [trace], 'layout': layout}
+
+
+def grouped_bar(frame, x, y, color, title=None, height=None):
+    """The figure of ``px.bar(frame, x=x, y=y, color=color, barmode='group')``: one trace per colour value."""
+    data = []
+    for i, (name, group) in enumerate(frame.groupby(color, sort=False)):
+        data.append({
+            'type': 'bar',
+            'name': str(name),
+            'x': array(group[x]),
+            'y': array(group[y]),
+            'marker': {'color': colorway[i % len(colorway)]},
+            'alignmentgroup': 'True',
+            'offsetgroup': str(name),
+            'legendgroup': str(name),
+            'orientation': 'v',
+            'textposition': 'auto',
+            'showlegend': True,
+            'hovertemplate': f"{color}={name}<br>{x}=%{{x}}<br>{y}=%{{y}}<extra></extra>",
+        })
+    layout = _layout(title, x, y, height)
+    layout['barmode'] = 'group'
+    layout['legend']['title'] = {'text': color}
+    return {'data': data, 'layout': layout}
+
+
+def pie(labels, values, label_title, value_title, title=None, height=None):
+    """The figure of ``px.pie(frame, names=..., values=...)``."""
+    return {
+        'data': [{
+            'type': 'pie',
+            'labels': array(labels),
+            'values': array(values),
+            'domain': {'x': [0.0, 1.0], 'y': [0.0, 1.0]},
+            'name': '',
+            'legendgroup': '',
+            'showlegend': True,
+            'hovertemplate': f"{label_title}=%{{label}}<br>{value_title}=%{{value}}<extra></extra>",
+        }],
+        'layout': _layout(title, height=height),
+    }
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from asharalo_data import equals, isin
+
+# Filter value meaning "no filter on this column"
+ALL = 'All'
+
+
+def mask(frame, filters):
+    """One combined boolean mask for ``{column: value}`` filters, or None when none is active.
+
+    'All' and None leave a column unfiltered; list values match any of their items.
+    Every condition is ANDed into the same array, so no intermediate frames are built.
+    """
+    combined = None
+    for column, value in filters.items():
+        if value is None or (isinstance(value, str) and value == ALL):
+            continue
+        if isinstance(value, (list, tuple, set)):
+            condition = isin(frame[column], value)
+        else:
+            condition = equals(frame[column], value)
+        # The first condition may be a read-only view of a column (pandas 3): AND into a copy
+        combined = condition.copy() if combined is None else np.logical_and(combined, condition, out=combined)
+    return combined
+
+
+def select(frame, filters, columns=None, extra=None):
+    """The rows of ``frame`` matching ``filters`` (and the optional ``extra`` mask), limited to ``columns``.
+
+    The base frame is never copied: only the matching rows of the requested columns are
+    materialised, and without any active filter the frame (or its columns) is returned as is.
+    """
+    combined = mask(frame, filters)
+    if extra is not None:
+        combined = extra if combined is None else np.logical_and(combined, extra, out=combined)
+    if combined is None:
+        return frame if columns is None else frame[columns]
+    if columns is None:
+        return frame[combined]
+    return frame.loc[combined, columns]
+
+
+class FilterIndex:
+    """Precomputed row bitmaps for the dashboards' filter dropdowns.
+
+    Every value of every filter column gets one bitmap of the frame's rows, packed
+    into 64-bit words. A filter combination is the bitwise AND of one bitmap per
+    selected value, so answering it touches rows / 64 words and builds no
+    intermediate DataFrames.
+    """
+
+    def __init__(self, frame, columns):
+        # columns maps the callback's filter name to the frame column, e.g. {'gender': 'Gender'}
+        self.columns = dict(columns)
+        self.rows = len(frame)
+        self.words = (self.rows + 63) // 64
+        self.bitmaps = {name: self._build(frame[column]) for name, column in self.columns.items()}
+
+    def _pack(self, mask):
+        padded = np.zeros(self.words * 64, dtype=bool)
+        padded[:self.rows] = mask
+        return np.packbits(padded, bitorder='little').view(np.uint64)
+
+    def _build(self, series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            return {value: self._pack(codes == code) for code, value in enumerate(series.cat.categories)}
+        values = series.to_numpy()
+        return {value: self._pack(values == value) for value in series.dropna().unique()}
+
+    def bitmap(self, **selected):
+        """Combined bitmap for the selected values, or None when every filter is 'All'."""
+        combined = None
+        for name, value in selected.items():
+            if value is None or value == ALL:
+                continue
+            # A value the survey has never seen matches no rows
+            bits = self.bitmaps[name].get(value)
+            if bits is None:
+                bits = np.zeros(self.words, dtype=np.uint64)
+            combined = bits.copy() if combined is None else np.bitwise_and(combined, bits, out=combined)
+        return combined
+
+    def positions(self, **selected):
+        """Row positions matching the selected values, or None when nothing is filtered."""
+        combined = self.bitmap(**selected)
+        if combined is None:
+            return None
+        bits = np.unpackbits(combined.view(np.uint8), count=self.rows, bitorder='little')
+        return np.flatnonzero(bits)
+
+    def count(self, **selected):
+        """Number of rows matching the selected values."""
+        positions = self.positions(**selected)
+        return self.rows if positions is None else len(positions)
+
+    def take(self, frame, **selected):
+        """The rows of the indexed frame matching the selected values."""
+        positions = self.positions(**selected)
+        return frame if positions is None else frame.iloc[positions]
@@ -0,0 +1,147 @@
+"""Background execution of slow callbacks on a local job queue.
+
+With ``ASHARALO_BACKGROUND`` set and diskcache, multiprocess and psutil installed,
+callbacks declared with ``background_callback`` run in a separate process managed
+by Dash's DiskcacheManager: the gunicorn worker only starts the job and answers
+the browser's polls, and the browser shows the progress the job reports through
+``report``. Results are kept per dataset version, and a request for inputs
+whose job is still running joins that job instead of starting another one.
+Without the setting or the packages the callbacks run synchronously, as before.
+
+An instrumented callback run as a job reports its timings and rows back with its
+result, so they still show on the ``/metrics`` of the worker answering the browser.
+"""
+import contextvars
+import functools
+import os
+import uuid
+
+import asharalo_data
+from asharalo_data import dataset_version
+from asharalo_metrics import metrics
+
+try:
+    import diskcache
+    import multiprocess  # noqa: F401 -- DiskcacheManager runs jobs in its processes
+    import psutil  # noqa: F401 -- and tracks them with psutil
+    from dash import DiskcacheManager
+except ImportError:  # the job queue is optional; without it background callbacks run in the request
+    diskcache = None
+
+# Run background callbacks as jobs (1) or synchronously in the request (0)
+enabled = os.environ.get('ASHARALO_BACKGROUND', '') not in ('', '0')
+
+# Where jobs leave their progress and results; shared by every worker on the host
+jobs_dir = os.environ.get('ASHARALO_JOBS_DIR', os.path.join(asharalo_data.cache_dir, 'jobs'))
+
+# Seconds an unread job result is kept, and how often the browser polls for it, in milliseconds
+expire = int(os.environ.get('ASHARALO_JOBS_EXPIRE', 600))
+interval = int(os.environ.get('ASHARALO_JOBS_INTERVAL', 500))
+
+# Progress setter of the job running in this context
+_set_progress = contextvars.ContextVar('asharalo_jobs_set_progress', default=None)
+
+
+def report(*values):
+    """Report progress of the background callback running in this context; a no-op otherwise.
+
+    ``values`` go to the callback's progress outputs, e.g. ``report("Sorting…")``.
+    """
+    set_progress = _set_progress.get()
+    if set_progress is not None:
+        set_progress(list(values))
+
+
+if diskcache is not None:
+    class JobManager(DiskcacheManager):
+        """DiskcacheManager running identical in-flight requests as one job.
+
+        Dash starts a process for every request of a background callback. Here the
+        process started for a cache key is recorded, and while it runs, requests
+        with the same key share it; it is only terminated once none of them waits.
+        A key whose result is already stored starts no process at all (job 0).
+        """
+
+        def __init__(self, cache, cache_by=None, expire=None):
+            super().__init__(cache, cache_by, expire)
+            # Serializes job bookkeeping across every worker sharing the cache
+            self.jobs_lock = diskcache.Lock(self.handle, 'asharalo-jobs-lock')
+
+        def call_job_fn(self, key, job_fn, args, context):
+            with self.jobs_lock:
+                if self.result_ready(key):
+                    return 0
+                job = self.handle.get(('job', key))
+                if job is None or not self.job_running(job):
+                    job = super().call_job_fn(key, job_fn, args, context)
+                    self.handle.set(('job', key), job, expire=expire)
+                self.handle.set(('waiters', job), self.handle.get(('waiters', job), 0) + 1, expire=expire)
+            return job
+
+        def get_result(self, key, job):
+            result = super().get_result(key, job)
+            if not (isinstance(result, dict) and 'asharalo_result' in result):
+                return result
+            records = result['asharalo_records']
+            if records:
+                # Observed once per run, however many requests share its stored result
+                if self.handle.add(('observed', result['asharalo_run']), True, expire=expire):
+                    for name, seconds, record in records:
+                        metrics.observe(name, seconds, record)
+                metrics.responding(records[-1][0])
+            return result['asharalo_result']
+
+        def terminate_job(self, job):
+            if job is None or int(job) == 0:
+                return
+            with self.jobs_lock:
+                waiters = self.handle.get(('waiters', int(job)), 1) - 1
+                if waiters > 0:
+                    # Another request still waits for this job's result
+                    self.handle.set(('waiters', int(job)), waiters, expire=expire)
+                    return
+                self.handle.delete(('waiters', int(job)))
+            super().terminate_job(job)
+
+
+manager = None
+if enabled and diskcache is not None:
+    manager = JobManager(diskcache.Cache(jobs_dir), cache_by=[dataset_version], expire=expire)
+
+
+def _run_job(func, args):
+    # The job's process never serves /metrics: the callback's records go back with its result
+    result, records = metrics.collect(func, *args)
+    return {'asharalo_result': result, 'asharalo_records': records, 'asharalo_run': uuid.uuid4().hex}
+
+
+def background_callback(app, *dependencies, progress=None, running=None):
+    """``app.callback`` running the decorated function as a background job when jobs are enabled.
+
+    ``progress`` lists the outputs receiving the values the function passes to
+    ``asharalo_jobs.report``; ``running`` the (output, value while running,
+    value after) triples Dash sets around the job. The function itself is returned
+    unchanged, so it can still be called directly.
+    """
+    def decorator(func):
+        if manager is None:
+            app.callback(*dependencies)(func)
+            return func
+
+        @functools.wraps(func)
+        def job(*args):
+            if progress is None:
+                return _run_job(func, args)
+            # Dash passes the progress setter first when the callback has progress outputs
+            set_progress, *args = args
+            token = _set_progress.set(set_progress)
+            try:
+                return _run_job(func, args)
+            finally:
+                _set_progress.reset(token)
+
+        app.callback(*dependencies, background=True, manager=manager, interval=interval,
+                     progress=progress, running=running)(job)
+        return func
+
+    return decorator
@@ -0,0 +1,91 @@
+"""Compact JSON for callback responses: figure arrays and table pages.
+
+Dash encodes every response with ``plotly.io.json.to_json_plotly``. With orjson
+installed that encoder writes NumPy arrays straight from their buffers, without
+turning each value into a Python object first, so the helpers here keep figure
+data as arrays instead of lists. Table pages are sent column by column and turned
+back into the rows a DataTable needs in the browser, so the column names are no
+longer repeated in every row.
+"""
+import base64
+import os
+
+import numpy as np
+import plotly.io as pio
+from dash.dependencies import Input, Output
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it Dash encodes with the json module
+    orjson = None
+
+# Send numeric trace data as base64 typed arrays ({'dtype': ..., 'bdata': ...}). The browser
+# needs plotly.js 2.28 or later to read them; the plotly.js dash 2.6 bundles is older,
+# so this is only for deployments on a newer Dash
+typed_arrays = os.environ.get('ASHARALO_TYPED_ARRAYS', '') not in ('', '0')
+
+if orjson is not None:
+    pio.json.config.default_engine = 'orjson'
+
+# The smallest typed array able to hold a column of integers, tried in order
+_integer_types = ('u1', 'i1', 'u2', 'i2', 'u4', 'i4')
+
+# Clientside callback turning a columnar table page back into DataTable rows
+records_js = """
+function (table) {
+    if (!table) {
+        return [];
+    }
+    var records = [];
+    var count = table.values.length ? table.values[0].length : 0;
+    for (var i = 0; i < count; i++) {
+        var record = {};
+        for (var j = 0; j < table.columns.length; j++) {
+            record[table.columns[j]] = table.values[j][i];
+        }
+        records.push(record);
+    }
+    return records;
+}
+"""
+
+
+def _typed(values):
+    if values.dtype.kind in 'iu':
+        low, high = (values.min(), values.max()) if len(values) else (0, 0)
+        for dtype in _integer_types:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                break
+        else:
+            dtype = 'f8'
+    else:
+        dtype = 'f4' if values.dtype == np.float32 else 'f8'
+    data = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': dtype, 'bdata': base64.b64encode(data.tobytes()).decode('ascii')}
+
+
+def array(values):
+    """Figure data for ``values``: numbers as a NumPy array (or typed array), anything else as a list."""
+    values = np.asarray(values)
+    if values.dtype.kind not in 'iuf':
+        return values.tolist()
+    values = np.ascontiguousarray(values)
+    return _typed(values) if typed_arrays else values
+
+
+def columnar(frame):
+    """A table page as ``{'columns': [...], 'values': [<column>, ...]}`` instead of one dict per row."""
+    values = []
+    for column in frame:
+        series = frame[column]
+        if series.dtype.kind in 'iuf':
+            values.append(np.ascontiguousarray(series))
+        else:
+            values.append(series.astype(object).where(series.notna(), None).tolist())
+    return {'columns': [str(column) for column in frame.columns], 'values': values}
+
+
+def columnar_table(app, store_id, table_id):
+    """Fill the DataTable ``table_id`` with the rows of the columnar page in the dcc.Store ``store_id``."""
+    app.clientside_callback(records_js, Output(table_id, 'data'), Input(store_id, 'data'))
@@ -0,0 +1,69 @@
+import copy
+
+# Location levels of the survey, from the top of the hierarchy down
+levels = ['District', 'Upazilla', 'Union', 'Name of the village']
+
+
+class LocationTree:
+    """District → Upazilla → Union → Village hierarchy with a record count per node.
+
+    Built once from the survey frame. A node is the tuple of names on its path, e.g.
+    ('Dhaka', 'Savar'), so listing the children of a selection costs O(children)
+    and never touches the frame.
+    """
+
+    def __init__(self, frame, levels=levels):
+        self.levels = list(levels)
+        self.counts = {}
+        self.children = {(): []}
+        # Nodes by name at each depth, for selections made without their parents
+        self.by_name = [{} for _ in self.levels]
+        for depth in range(1, len(self.levels) + 1):
+            # Counted per level, so rows missing a lower level still count towards their parents
+            sizes = frame.groupby(self.levels[:depth], observed=True, sort=False).size()
+            for key, count in sizes.items():
+                self._add(key if isinstance(key, tuple) else (key,), int(count))
+
+    def _add(self, path, count):
+        if path in self.counts:
+            self.counts[path] += count
+            return
+        self.counts[path] = count
+        self.children.setdefault(path[:-1], []).append(path[-1])
+        self.by_name[len(path) - 1].setdefault(path[-1], []).append(path)
+
+    def merged(self, batch):
+        """Tree over this tree's records plus those of ``batch``, a tree built from new rows only.
+
+        Counts are added node by node; nodes first seen in the batch are listed after
+        the existing ones, as a rebuild over the combined rows would.
+        """
+        tree = copy.copy(self)
+        tree.counts = dict(self.counts)
+        tree.children = {path: list(names) for path, names in self.children.items()}
+        tree.by_name = [{name: list(paths) for name, paths in level.items()} for level in self.by_name]
+        for path, count in batch.counts.items():
+            tree._add(path, count)
+        return tree
+
+    def children_of(self, *path):
+        """(name, count) for each child of the node at ``path``; () lists the districts."""
+        return [(name, self.counts[path + (name,)]) for name in self.children.get(path, ())]
+
+    def children_of_names(self, depth, names):
+        """(name, count) for the children of every node at ``depth`` called one of ``names``.
+
+        Nodes with the same name under different parents are merged, matching a
+        multi-select dropdown that only knows the selected names.
+        """
+        merged = {}
+        for name in names or ():
+            for path in self.by_name[depth].get(name, ()):
+                for child in self.children.get(path, ()):
+                    merged[child] = merged.get(child, 0) + self.counts[path + (child,)]
+        return list(merged.items())
+
+
+def options(children):
+    """Dropdown options for (name, count) pairs, labelled with the record count."""
+    return [{'label': f"{name} ({count})", 'value': name} for name, count in children]
@@ -0,0 +1,226 @@
+import contextvars
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+
+import flask
+
+try:
+    import pyinstrument
+except ImportError:  # pyinstrument is optional; without it profiles come from cProfile
+    pyinstrument = None
+    import cProfile
+
+# Upper bounds, in seconds, of the callback latency histogram buckets
+buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Allow profiling single requests that carry an ``X-Asharalo-Profile`` header
+profiling = os.environ.get('ASHARALO_PROFILING', '') not in ('', '0')
+
+# Stage timings and row counts of the callback running in this context
+_record = contextvars.ContextVar('asharalo_metrics_record', default=None)
+
+# Records of the instrumented callbacks finished in this context, when they are collected
+# instead of observed (see Metrics.collect)
+_collected = contextvars.ContextVar('asharalo_metrics_collected', default=None)
+
+
+def lap(stage):
+    """Charge the time since the previous lap (or the callback's start) to ``stage``.
+
+    Called between the steps of an instrumented callback, e.g. ``lap('filter')``
+    after filtering and ``lap('figure')`` after building the figure.
+    """
+    record = _record.get()
+    if record is not None:
+        now = time.perf_counter()
+        record['stages'][stage] = record['stages'].get(stage, 0.0) + now - record['lap']
+        record['lap'] = now
+
+
+def rows(rows_in=0, rows_out=0):
+    """Count the rows the callback being instrumented read and kept."""
+    record = _record.get()
+    if record is not None:
+        record['rows_in'] += rows_in
+        record['rows_out'] += rows_out
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Per-callback timings, row counts and response sizes of this process, in Prometheus format.
+
+    Callbacks are wrapped with ``instrument``; ``register`` adds the ``/metrics``
+    route and the request hooks measuring the JSON responses Dash sends. Each
+    gunicorn worker reports its own numbers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callbacks = {}
+        self.profiles = deque(maxlen=10)
+
+    def _stats(self, name):
+        stats = self.callbacks.get(name)
+        if stats is None:
+            stats = self.callbacks[name] = {
+                'buckets': [0] * len(buckets), 'count': 0, 'seconds': 0.0, 'stages': {},
+                'rows_in': 0, 'rows_out': 0, 'responses': 0, 'response_bytes': 0,
+            }
+        return stats
+
+    def observe(self, name, seconds, record):
+        with self.lock:
+            stats = self._stats(name)
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            for i, bound in enumerate(buckets):
+                if seconds <= bound:
+                    stats['buckets'][i] += 1
+            for stage_name, stage_seconds in record['stages'].items():
+                stats['stages'][stage_name] = stats['stages'].get(stage_name, 0.0) + stage_seconds
+            stats['rows_in'] += record['rows_in']
+            stats['rows_out'] += record['rows_out']
+
+    def observe_response(self, name, size, seconds):
+        with self.lock:
+            stats = self._stats(name)
+            stats['responses'] += 1
+            stats['response_bytes'] += size
+            # Time Dash spends encoding the result after the callback returned
+            stats['stages']['serialize'] = stats['stages'].get('serialize', 0.0) + seconds
+
+    def instrument(self, func):
+        """Decorator recording the duration, stages and rows of a callback."""
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            record = {'stages': {}, 'rows_in': 0, 'rows_out': 0, 'lap': start}
+            token = _record.set(record)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                _record.reset(token)
+                collected = _collected.get()
+                if collected is not None:
+                    collected.append((name, end - start, record))
+                else:
+                    self.observe(name, end - start, record)
+                    self.responding(name, end)
+
+        return wrapper
+
+    def responding(self, name, end=None):
+        """Count the response of the current request, if any, as the response of callback ``name``."""
+        if flask.has_request_context():
+            flask.g.asharalo_callback = (name, time.perf_counter() if end is None else end)
+
+    def collect(self, func, *args):
+        """Call ``func(*args)``; returns its result and the records of the instrumented callbacks it ran.
+
+        The records are not observed here. This is for background jobs, whose process
+        never serves ``/metrics``: the records travel back with the job's result, and
+        the process answering the browser passes each of them to ``observe``.
+        """
+        records = []
+        token = _collected.set(records)
+        try:
+            return func(*args), records
+        finally:
+            _collected.reset(token)
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def family(metric, kind, help_text):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+        with self.lock:
+            callbacks = sorted(self.callbacks.items())
+            family('asharalo_callback_duration_seconds', 'histogram', 'Time spent in each dashboard callback.')
+            for name, stats in callbacks:
+                label = f'callback="{_label(name)}"'
+                for bound, count in zip(buckets, stats['buckets']):
+                    lines.append(f'asharalo_callback_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'asharalo_callback_duration_seconds_bucket{{{label},le="+Inf"}} {stats["count"]}')
+                lines.append(f'asharalo_callback_duration_seconds_sum{{{label}}} {stats["seconds"]}')
+                lines.append(f'asharalo_callback_duration_seconds_count{{{label}}} {stats["count"]}')
+            family('asharalo_callback_stage_seconds_total', 'counter', 'Time spent in each stage of a callback.')
+            for name, stats in callbacks:
+                for stage_name, seconds in sorted(stats['stages'].items()):
+                    lines.append(f'asharalo_callback_stage_seconds_total{{callback="{_label(name)}",stage="{_label(stage_name)}"}} {seconds}')
+            for key, help_text in [
+                ('rows_in', 'Survey rows read by a callback.'),
+                ('rows_out', 'Rows left after a callback filtered them.'),
+                ('responses', 'Callback responses sent.'),
+                ('response_bytes', 'Bytes of JSON sent in callback responses.'),
+            ]:
+                metric = f'asharalo_callback_{key}_total'
+                family(metric, 'counter', help_text)
+                for name, stats in callbacks:
+                    lines.append(f'{metric}{{callback="{_label(name)}"}} {stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+    def _before_request(self):
+        request = flask.request
+        if not request.path.endswith('_dash-update-component'):
+            return
+        if profiling and request.headers.get('X-Asharalo-Profile'):
+            if pyinstrument is not None:
+                profiler = pyinstrument.Profiler()
+                profiler.start()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+            flask.g.asharalo_profiler = profiler
+
+    def _after_request(self, response):
+        callback = flask.g.pop('asharalo_callback', None)
+        if callback is not None:
+            name, end = callback
+            size = response.content_length
+            if size is None and not response.is_streamed:
+                size = len(response.get_data())
+            self.observe_response(name, size or 0, time.perf_counter() - end)
+        profiler = flask.g.pop('asharalo_profiler', None)
+        if profiler is not None:
+            if pyinstrument is not None:
+                profiler.stop()
+                report = profiler.output_text()
+            else:
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(40)
+                report = out.getvalue()
+            name = callback[0] if callback else flask.request.path
+            with self.lock:
+                self.profiles.append(f"# {name} at {time.strftime('%Y-%m-%d %H:%M:%S')}\n{report}")
+        return response
+
+    def register(self, server):
+        """Expose the metrics on ``/metrics`` of a Flask server and measure its callback responses."""
+        if 'metrics' in server.view_functions:
+            return
+        server.add_url_rule('/metrics', 'metrics', lambda: flask.Response(
+            self.render(), mimetype='text/plain; version=0.0.4'))
+        if profiling:
+            server.add_url_rule('/_profile', 'profile', lambda: flask.Response(
+                '\n'.join(self.profiles) or 'No profiled requests yet\n', mimetype='text/plain'))
+        server.before_request(self._before_request)
+        server.after_request(self._after_request)
+
+
+# Process-wide metrics shared by every app's callbacks
+metrics = Metrics()
@@ -1,18 +1,74 @@
 import dash
 from dash import dcc, html, Input, Output, dash_table
-import plotly.express as px
-import pandas as pd
+from asharalo_cache import figure_cache
+from asharalo_cube import Cube, additive, ranked
+from asharalo_data import current
+from asharalo_figures import bar, pie
+from asharalo_index import FilterIndex
+from asharalo_json import columnar, columnar_table
+from asharalo_metrics import lap, metrics
+from asharalo_server import dash_kwargs, register_http
 
-# Load data from the CSV file
-url = 'https://raw.githubusercontent.com/mamunalbd4/asharalo/main/asharalofinal.csv'
-df = pd.read_csv(url)
+# Aggregates behind each chart, computed from one filtered slice of the data. All of them
+# are counts, so the cube can merge in new batches of records (see Dataset.append)
+@additive
+def income_sum_counts(filtered_df):
+    # Recalculate the sum of counts for the filtered data
+    return filtered_df.groupby(["Person's monthly income?"]).size()
+
+@ranked
+def occupation_counts(filtered_df):
+    # Filter out rows with blank values in the 'Person's occupation?' column
+    filtered_df = filtered_df.dropna(subset=["Person's occupation?"], how="any")
+    
+    # Calculate the count of each occupation
+    return filtered_df['Person\'s occupation?'].value_counts()
+
+@additive
+def age_for_occ_sum_counts(filtered_df):
+    # Filter out rows with blank values in the 'Age for Occ' column
+    filtered_df = filtered_df.dropna(subset=["Age for Occ"], how="any")
+    
+    # Recalculate the sum of counts for the filtered data
+    return filtered_df.groupby(["Age for Occ"]).size()
+
+@additive
+def occupation_table_counts(filtered_df):
+    # Filter out rows with blank values in the 'Person's occupation?' and 'Person's monthly income?' columns
+    filtered_df = filtered_df.dropna(subset=["Person's occupation?", "Person's monthly income?"], how="any")
+    
+    # Group by both 'Person's occupation?' and 'Person's monthly income?' and calculate the total count
+    return filtered_df.groupby(["Person's occupation?", "Person's monthly income?"]).size()
+
+# Aggregates for one version of the data from the shared survey loader
+def build_cube(df):
+    # Filter out rows with blank values in the 'Person's monthly income?' column
+    df = df.dropna(subset=["Person's monthly income?"], how="any")
+
+    # Row bitmaps for the gender, disability card and skilled dropdowns
+    index = FilterIndex(df, {
+        'gender': 'Gender',
+        'disability': 'Have a disability golden citizen card?',
+        'skilled': 'Is the person Skilled?',
+    })
 
-# Filter out rows with blank values in the 'Person's monthly income?' column
-df = df.dropna(subset=["Person's monthly income?"], how="any")
+    # Every aggregate above, precomputed for every dropdown combination ('All' included)
+    return Cube(df, index, {
+        'income_sum_counts': income_sum_counts,
+        'occupation_counts': occupation_counts,
+        'age_for_occ_sum_counts': age_for_occ_sum_counts,
+        'occupation_table_counts': occupation_table_counts,
+    })
+
+# Load the data and build its aggregates before serving; a newer version gets its own cube
+current().derive(build_cube)
 
 # Create a Dash app
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, **dash_kwargs('/person-income/'))
 server=app.server
+register_http(server)
+figure_cache.register(server)
+metrics.register(server)
 
 # Define the layout of the app with center-aligned dropdown menus and CSS styling
 app.layout = html.Div([
@@ -83,152 +139,68 @@ app.layout = html.Div([
         ],
         style_table={'overflowX': 'scroll'},
     ),
+    # The table's rows, sent column by column and expanded into the table in the browser
+    dcc.Store(id='occupation-table-columns'),
 ])
+columnar_table(app, 'occupation-table-columns', 'occupation-table')
 
-# Define callback to update the bar chart for income based on dropdown values
+# Define one callback updating every chart and the table based on dropdown values
 @app.callback(
     Output('income-sum-count-bar-chart', 'figure'),
-    Input('gender-dropdown', 'value'),
-    Input('disability-dropdown', 'value'),
-    Input('skilled-dropdown', 'value')
-)
-def update_income_bar_chart(selected_gender, selected_disability, selected_skilled):
-    filtered_df = df.copy()
-    
-    # Apply filter based on selected gender, but ignore 'All'
-    if selected_gender != 'All':
-        filtered_df = filtered_df[filtered_df['Gender'] == selected_gender]
-    
-    # Apply filter based on selected disability status, but ignore 'All'
-    if selected_disability != 'All':
-        filtered_df = filtered_df[filtered_df['Have a disability golden citizen card?'] == selected_disability]
-    
-    # Apply filter based on selected skilled status, but ignore 'All'
-    if selected_skilled != 'All':
-        filtered_df = filtered_df[filtered_df['Is the person Skilled?'] == selected_skilled]
-    
-    # Recalculate the sum of counts for the filtered data
-    filtered_sum_count_df = filtered_df.groupby(["Person's monthly income?"]).size().reset_index(name='Sum of Counts')
-    
-    # Create and return the updated income bar chart
-    income_bar_chart_fig = px.bar(
-        filtered_sum_count_df,
-        x="Person's monthly income?",
-        y='Sum of Counts',
-        title="Income Distribution",
-        color="Person's monthly income?"
-    )
-    
-    return income_bar_chart_fig
-
-# Define callback to update the pie chart for occupation based on dropdown values
-@app.callback(
     Output('occupation-pie-chart', 'figure'),
+    Output('age-for-occ-bar-chart', 'figure'),
+    Output('occupation-table-columns', 'data'),
     Input('gender-dropdown', 'value'),
     Input('disability-dropdown', 'value'),
     Input('skilled-dropdown', 'value')
 )
-def update_occupation_pie_chart(selected_gender, selected_disability, selected_skilled):
-    filtered_df = df.copy()
-    
-    # Apply filter based on selected gender, but ignore 'All'
-    if selected_gender != 'All':
-        filtered_df = filtered_df[filtered_df['Gender'] == selected_gender]
-    
-    # Apply filter based on selected disability status, but ignore 'All'
-    if selected_disability != 'All':
-        filtered_df = filtered_df[filtered_df['Have a disability golden citizen card?'] == selected_disability]
-    
-    # Apply filter based on selected skilled status, but ignore 'All'
-    if selected_skilled != 'All':
-        filtered_df = filtered_df[filtered_df['Is the person Skilled?'] == selected_skilled]
-    
-    # Filter out rows with blank values in the 'Person's occupation?' column
-    filtered_df = filtered_df.dropna(subset=["Person's occupation?"], how="any")
+@metrics.instrument
+@figure_cache.memoize
+def update_charts(selected_gender, selected_disability, selected_skilled):
+    # Look up the aggregates precomputed for the selected filters; 'All' is the rollup
+    cube = current().derive(build_cube)
+    aggregates = cube.get(gender=selected_gender, disability=selected_disability, skilled=selected_skilled)
+    lap('aggregate')
+    
+    # Create the updated income bar chart
+    income_sum_counts = aggregates['income_sum_counts']
+    income_bar_chart_fig = bar(
+        income_sum_counts.index,
+        income_sum_counts.values,
+        "Person's monthly income?",
+        'Sum of Counts',
+        title="Income Distribution"
+    )
     
-    # Calculate the count of each occupation
-    occupation_count_df = filtered_df['Person\'s occupation?'].value_counts().reset_index()
-    occupation_count_df.columns = ['Occupation', 'Count']
-    
-    # Create and return the occupation pie chart
-    occupation_pie_chart_fig = px.pie(
-        occupation_count_df,
-        names='Occupation',
-        values='Count',
+    # Create the occupation pie chart
+    occupation_counts = aggregates['occupation_counts']
+    occupation_pie_chart_fig = pie(
+        occupation_counts.index,
+        occupation_counts.values,
+        'Occupation',
+        'Count',
         title="Occupation Distribution",
     )
     
-    return occupation_pie_chart_fig
-
-# Define callback to update the bar chart for age based on dropdown values
-@app.callback(
-    Output('age-for-occ-bar-chart', 'figure'),
-    Input('gender-dropdown', 'value'),
-    Input('disability-dropdown', 'value'),
-    Input('skilled-dropdown', 'value')
-)
-def update_age_for_occ_bar_chart(selected_gender, selected_disability, selected_skilled):
-    filtered_df = df.copy()
-    
-    # Apply filter based on selected gender, but ignore 'All'
-    if selected_gender != 'All':
-        filtered_df = filtered_df[filtered_df['Gender'] == selected_gender]
-    
-    # Apply filter based on selected disability status, but ignore 'All'
-    if selected_disability != 'All':
-        filtered_df = filtered_df[filtered_df['Have a disability golden citizen card?'] == selected_disability]
-    
-    # Apply filter based on selected skilled status, but ignore 'All'
-    if selected_skilled != 'All':
-        filtered_df = filtered_df[filtered_df['Is the person Skilled?'] == selected_skilled]
-    
-    # Filter out rows with blank values in the 'Age for Occ' column
-    filtered_df = filtered_df.dropna(subset=["Age for Occ"], how="any")
-    
-    # Recalculate the sum of counts for the filtered data
-    age_for_occ_sum_count_df = filtered_df.groupby(["Age for Occ"]).size().reset_index(name='Sum of Counts')
-    
-    # Create and return the age for occupation bar chart
-    age_for_occ_bar_chart_fig = px.bar(
-        age_for_occ_sum_count_df,
-        x="Age for Occ",
-        y='Sum of Counts',
+    # Create the age for occupation bar chart
+    age_for_occ_sum_counts = aggregates['age_for_occ_sum_counts']
+    age_for_occ_bar_chart_fig = bar(
+        age_for_occ_sum_counts.index,
+        age_for_occ_sum_counts.values,
+        "Age for Occ",
+        'Sum of Counts',
         title="Age for Occupation Distribution",
-        color="Age for Occ",
     )
     
-    return age_for_occ_bar_chart_fig
-
-# Define callback to update the occupation table based on dropdown values
-@app.callback(
-    Output('occupation-table', 'data'),
-    Input('gender-dropdown', 'value'),
-    Input('disability-dropdown', 'value'),
-    Input('skilled-dropdown', 'value')
-)
-def update_occupation_table(selected_gender, selected_disability, selected_skilled):
-    filtered_df = df.copy()
-    
-    # Apply filter based on selected gender, but ignore 'All'
-    if selected_gender != 'All':
-        filtered_df = filtered_df[filtered_df['Gender'] == selected_gender]
-    
-    # Apply filter based on selected disability status, but ignore 'All'
-    if selected_disability != 'All':
-        filtered_df = filtered_df[filtered_df['Have a disability golden citizen card?'] == selected_disability]
-    
-    # Apply filter based on selected skilled status, but ignore 'All'
-    if selected_skilled != 'All':
-        filtered_df = filtered_df[filtered_df['Is the person Skilled?'] == selected_skilled]
+    lap('figure')
     
-    # Filter out rows with blank values in the 'Person's occupation?' and 'Person's monthly income?' columns
-    filtered_df = filtered_df.dropna(subset=["Person's occupation?", "Person's monthly income?"], how="any")
-    
-    # Group by both 'Person's occupation?' and 'Person's monthly income?' and calculate the total count
-    occupation_table_df = filtered_df.groupby(["Person's occupation?", "Person's monthly income?"]).size().reset_index(name='Total Count')
+    # Rows of the occupation table
+    occupation_table_df = aggregates['occupation_table_counts'].reset_index(name='Total Count')
     occupation_table_df.columns = ['Occupation', 'Income Category', 'Total Count']
+    occupation_table = columnar(occupation_table_df)
+    lap('records')
     
-    return occupation_table_df.to_dict('records')
+    return income_bar_chart_fig, occupation_pie_chart_fig, age_for_occ_bar_chart_fig, occupation_table
 
 # Run the app
 if __name__ == '__main__':
@@ -1,156 +1,426 @@
+import csv
+import io
+import os
+import tempfile
+import urllib.parse
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
+import flask
 from dash import dash_table
 import pandas as pd
 from dash.dependencies import Input, Output
+from asharalo_cache import figure_cache
+from asharalo_data import current
+from asharalo_index import select
+from asharalo_jobs import background_callback, report
+from asharalo_json import columnar, columnar_table
+from asharalo_locations import LocationTree, options
+from asharalo_metrics import lap, metrics, rows
+from asharalo_server import dash_kwargs, register_http
 
-# Load the CSV data
-url = "https://raw.githubusercontent.com/mamunalbd4/asharalo/main/asharalofinal.csv"
-df = pd.read_csv(url)
+try:
+    import openpyxl
+except ImportError:  # openpyxl is optional; without it only CSV downloads are offered
+    openpyxl = None
 
 # Initialize the Dash app
-app = dash.Dash(__name__)
+app = dash.Dash(__name__, **dash_kwargs('/personal-information/'))
 server=app.server
+register_http(server)
+figure_cache.register(server)
+metrics.register(server)
 
-# Create unique lists for District, Upazilla, Union, and Name of the village
-districts = df['District'].unique()
-upazilas = df['Upazilla'].unique()
-unions = df['Union'].unique()
-villages = df['Name of the village'].unique()
-
-# Define the app layout
-app.layout = html.Div([
-    html.Div([
-        html.H1("Ashar Alo project location-wise personal information", style={'text-align': 'center'}),
-        html.H3("District, Upazilla, Union", style={'text-align': 'center'}),
-        html.Div(id='data-count', style={'text-align': 'center', 'font-weight': 'bold', 'margin-top': '10px'}),
-        
+# Load the survey data and its District → Upazilla → Union → Village tree with record
+# counts before serving; each request uses the version current when it started
+current().derive(LocationTree)
+
+# Columns shown in the table; only these are ever sent to the browser
+table_columns = [
+    "Name of child / person",
+    "Age",
+    "Father's name of the child / person",
+    "Mother name of the child / person",
+    "Gender",
+    "District",
+    "Upazilla",
+    "Union",
+    "Name of the village",
+]
+
+# Rows per table page; only one page is serialized per request
+page_size = 25
+
+# Survey rows filtered and written per step of a download, which bounds its memory
+export_rows = int(os.environ.get('ASHARALO_EXPORT_ROWS', 50000))
+
+# Data rows per Excel worksheet; longer downloads continue on another sheet
+sheet_rows = 1048575
+
+# DataTable filter_query operators, as written by the table's filter row
+operators = [['ge ', '>='],
+             ['le ', '<='],
+             ['lt ', '<'],
+             ['gt ', '>'],
+             ['ne ', '!='],
+             ['eq ', '='],
+             ['contains '],
+             ['datestartswith ']]
+
+
+def split_filter_part(filter_part):
+    for operator_type in operators:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ''
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', '`'):
+                    value = value_part[1: -1].replace('\\' + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value
+
+    return [None] * 3
+
+
+def filter_query_mask(frame, filter_query):
+    """Boolean mask for the table's filter_query over ``frame``, or None if it has no conditions."""
+    combined = None
+    for filter_part in (filter_query or '').split(' && '):
+        col_name, operator, filter_value = split_filter_part(filter_part)
+        if col_name not in frame:
+            continue
+        series = frame[col_name]
+        if operator in ('contains', 'datestartswith'):
+            # Text operators match the value as typed, not its float parse (1 rather than 1.0)
+            if isinstance(filter_value, float) and filter_value.is_integer():
+                filter_value = int(filter_value)
+            text = series.astype(str).str
+            if operator == 'contains':
+                condition = text.contains(str(filter_value), regex=False)
+            else:
+                condition = text.startswith(str(filter_value))
+        else:
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                series = series.astype(object)
+            try:
+                condition = getattr(series, operator)(filter_value)
+            except TypeError:
+                # e.g. a number compared with a text column: nothing matches
+                condition = pd.Series(False, index=series.index)
+        condition = condition.to_numpy(dtype=bool, na_value=False)
+        combined = condition if combined is None else combined & condition
+    return combined
+
+
+def sort_key(series):
+    # Categoricals sort by category order: make it alphabetical (appended batches add theirs at the end)
+    if isinstance(series.dtype, pd.CategoricalDtype) and not series.cat.categories.is_monotonic_increasing:
+        return series.cat.set_categories(series.cat.categories.sort_values())
+    return series
+
+
+def select_records(frame, selected_districts, selected_upazillas, selected_unions, selected_villages, age_range,
+                   selected_gender, filter_query=''):
+    """The table's columns of the rows of ``frame`` matching the dropdowns, age range, gender and column filters."""
+    min_age, max_age = age_range
+    # One combined mask over the base frame, materialising only the table's columns
+    filtered_df = select(frame, {
+        'District': selected_districts or [],
+        'Upazilla': selected_upazillas or [],
+        'Union': selected_unions or [],
+        'Name of the village': selected_villages or [],
+        'Gender': selected_gender,
+    }, table_columns, extra=frame['Age'].between(min_age, max_age).to_numpy())
+
+    # Column filters typed into the table
+    query_mask = filter_query_mask(filtered_df, filter_query)
+    if query_mask is not None:
+        filtered_df = filtered_df[query_mask]
+    return filtered_df
+
+# Define the app layout, rebuilt on every page load so the districts follow the current data
+def serve_layout():
+    locations = current().derive(LocationTree)
+    return html.Div([
         html.Div([
-            html.H4("Age Range", style={'text-align': 'center', 'color': 'blue'}),
-            dcc.RangeSlider(
-                id='age-slider',
-                marks={i: str(i) for i in range(0, 101, 10)},
-                min=0,
-                max=100,
-                step=1,
-                value=[0, 100]
-            ),
+            html.H1("Ashar Alo project location-wise personal information", style={'text-align': 'center'}),
+            html.H3("District, Upazilla, Union", style={'text-align': 'center'}),
+            html.Div(id='data-count', style={'text-align': 'center', 'font-weight': 'bold', 'margin-top': '10px'}),
+            # Download links for every filtered record, pointed at the current filters
+            html.Div(id='export-links', style={'text-align': 'center', 'margin-top': '10px'}),
+            # What a table update running as a background job is doing, shown while it runs
+            html.Div(id='table-progress', style={'text-align': 'center', 'visibility': 'hidden'}),
+        
+            html.Div([
+                html.H4("Age Range", style={'text-align': 'center', 'color': 'blue'}),
+                dcc.RangeSlider(
+                    id='age-slider',
+                    marks={i: str(i) for i in range(0, 101, 10)},
+                    min=0,
+                    max=100,
+                    step=1,
+                    value=[0, 100]
+                ),
             
-        ], style={'margin': '20px'}),
+            ], style={'margin': '20px'}),
         
-        html.Div([
-            dcc.RadioItems(
-                id='gender-radio',
-                options=[
-                    {'label': 'All Genders', 'value': 'All'},
-                    {'label': 'Male', 'value': 'Male'},
-                    {'label': 'Female', 'value': 'Female'},
-                    {'label': 'Other', 'value': 'Other'}
-                ],
-                value='All',
-                labelStyle={'display': 'block', 'text-align': 'center', 'margin-top': '10px'}  # Center-align labels
-            )
-        ], style={'text-align': 'center'}),  # Center-align the radio buttons
+            html.Div([
+                dcc.RadioItems(
+                    id='gender-radio',
+                    options=[
+                        {'label': 'All Genders', 'value': 'All'},
+                        {'label': 'Male', 'value': 'Male'},
+                        {'label': 'Female', 'value': 'Female'},
+                        {'label': 'Other', 'value': 'Other'}
+                    ],
+                    value='All',
+                    labelStyle={'display': 'block', 'text-align': 'center', 'margin-top': '10px'}  # Center-align labels
+                )
+            ], style={'text-align': 'center'}),  # Center-align the radio buttons
         
-        dcc.Dropdown(
-            id='district-dropdown',
-            options=[{'label': district, 'value': district} for district in districts],
-            multi=True,
-            value=[]
-        ),
+            dcc.Dropdown(
+                id='district-dropdown',
+                options=options(locations.children_of()),
+                multi=True,
+                value=[]
+            ),
         
-        dcc.Dropdown(
-            id='upazilla-dropdown',
-            multi=True,
-            value=[]
-        ),
+            dcc.Dropdown(
+                id='upazilla-dropdown',
+                multi=True,
+                value=[]
+            ),
         
-        dcc.Dropdown(
-            id='union-dropdown',
-            multi=True,
-            value=[]
-        ),
+            dcc.Dropdown(
+                id='union-dropdown',
+                multi=True,
+                value=[]
+            ),
         
-        dcc.Dropdown(
-            id='village-dropdown',
-            multi=True,
-            value=[]
-        ),
+            dcc.Dropdown(
+                id='village-dropdown',
+                multi=True,
+                value=[]
+            ),
         
-        dash_table.DataTable(
-            id='datatable',
-            columns=[
-                {"name": "Name of child / person", "id": "Name of child / person"},
-                {"name": "Age", "id": "Age"},
-                {"name": "Father's name of the child / person", "id": "Father's name of the child / person"},
-                {"name": "Mother name of the child / person", "id": "Mother name of the child / person"},
-                {"name": "Gender", "id": "Gender"},
-                {"name": "District", "id": "District"},
-                {"name": "Upazilla", "id": "Upazilla"},
-                {"name": "Union", "id": "Union"},
-                {"name": "Name of the village", "id": "Name of the village"},
-            ],
-            data=df.to_dict('records'),
-            style_table={'overflowX': 'auto'},
-        ),
-    ], style={'margin': 'auto', 'max-width': '800px'}),  # Center-align the container
-])
+            dash_table.DataTable(
+                id='datatable',
+                columns=[{"name": column, "id": column} for column in table_columns],
+                # Paging, sorting and filtering happen on the server, one page at a time
+                page_current=0,
+                page_size=page_size,
+                page_action='custom',
+                sort_action='custom',
+                sort_mode='multi',
+                sort_by=[],
+                filter_action='custom',
+                filter_query='',
+                style_table={'overflowX': 'auto'},
+            ),
+            # The page's rows, sent column by column and expanded into the table in the browser
+            dcc.Store(id='datatable-columns'),
+        ], style={'margin': 'auto', 'max-width': '800px'}),  # Center-align the container
+    ])
+
+app.layout = serve_layout
+columnar_table(app, 'datatable-columns', 'datatable')
 
 # Callbacks to update dropdown options based on selection, age range, and gender
 @app.callback(
     Output('upazilla-dropdown', 'options'),
     Input('district-dropdown', 'value')
 )
+@metrics.instrument
 def update_upazilla_options(selected_districts):
-    filtered_df = df[df['District'].isin(selected_districts)]
-    return [{'label': upazilla, 'value': upazilla} for upazilla in filtered_df['Upazilla'].unique()]
+    locations = current().derive(LocationTree)
+    return options(locations.children_of_names(0, selected_districts))
 
 @app.callback(
     Output('union-dropdown', 'options'),
     Input('upazilla-dropdown', 'value')
 )
+@metrics.instrument
 def update_union_options(selected_upazillas):
-    filtered_df = df[df['Upazilla'].isin(selected_upazillas)]
-    return [{'label': union, 'value': union} for union in filtered_df['Union'].unique()]
+    locations = current().derive(LocationTree)
+    return options(locations.children_of_names(1, selected_upazillas))
 
 @app.callback(
     Output('village-dropdown', 'options'),
     Input('union-dropdown', 'value')
 )
+@metrics.instrument
 def update_village_options(selected_unions):
-    filtered_df = df[df['Union'].isin(selected_unions)]
-    return [{'label': village, 'value': village} for village in filtered_df['Name of the village'].unique()]
+    locations = current().derive(LocationTree)
+    return options(locations.children_of_names(2, selected_unions))
 
-# Callback to update the table based on dropdown selections, age range, and gender
-@app.callback(
-    Output('datatable', 'data'),
+# Callback to update the table based on dropdown selections, age range, and gender; with
+# background jobs enabled it runs outside the request thread (see asharalo_jobs)
+@background_callback(
+    app,
+    Output('datatable-columns', 'data'),
+    Output('datatable', 'page_count'),
+    Output('datatable', 'page_current'),
     Output('data-count', 'children'),
     Input('district-dropdown', 'value'),
     Input('upazilla-dropdown', 'value'),
     Input('union-dropdown', 'value'),
     Input('village-dropdown', 'value'),
     Input('age-slider', 'value'),
-    Input('gender-radio', 'value')
+    Input('gender-radio', 'value'),
+    Input('datatable', 'page_current'),
+    Input('datatable', 'page_size'),
+    Input('datatable', 'sort_by'),
+    Input('datatable', 'filter_query'),
+    progress=[Output('table-progress', 'children')],
+    running=[(Output('table-progress', 'style'),
+              {'text-align': 'center', 'visibility': 'visible'},
+              {'text-align': 'center', 'visibility': 'hidden'})],
 )
-def update_table(selected_districts, selected_upazillas, selected_unions, selected_villages, age_range, selected_gender):
-    min_age, max_age = age_range
-    filtered_df = df[
-        (df['District'].isin(selected_districts)) &
-        (df['Upazilla'].isin(selected_upazillas)) &
-        (df['Union'].isin(selected_unions)) &
-        (df['Name of the village'].isin(selected_villages)) &
-        (df['Age'] >= min_age) &
-        (df['Age'] <= max_age)
-    ]
-    
-    if selected_gender != 'All':
-        filtered_df = filtered_df[filtered_df['Gender'] == selected_gender]
+@metrics.instrument
+@figure_cache.memoize
+def update_table(selected_districts, selected_upazillas, selected_unions, selected_villages, age_range, selected_gender,
+                 page_current=0, page_size=page_size, sort_by=None, filter_query=''):
+    df = current().frame
+    report("Filtering records…")
+    filtered_df = select_records(df, selected_districts, selected_upazillas, selected_unions, selected_villages,
+                                 age_range, selected_gender, filter_query)
+    lap('filter')
     
     data_count = len(filtered_df)
+    rows(len(df), data_count)
     data_count_text = f"Total Data Records: {data_count}"
     
-    return filtered_df.to_dict('records'), data_count_text
+    if sort_by:
+        report(f"Sorting {data_count} records…")
+        filtered_df = filtered_df.sort_values(
+            [col['column_id'] for col in sort_by],
+            ascending=[col['direction'] == 'asc' for col in sort_by],
+            kind='stable',
+            key=sort_key
+        )
+        lap('sort')
+    
+    # Serialize only the requested page, keeping it within the filtered rows
+    page_count = max((data_count + page_size - 1) // page_size, 1)
+    page_current = min(page_current or 0, page_count - 1)
+    page = filtered_df.iloc[page_current * page_size:(page_current + 1) * page_size]
+    records = columnar(page)
+    lap('records')
+    
+    return records, page_count, page_current, data_count_text
+
+# Callback pointing the download links at the current filters
+@app.callback(
+    Output('export-links', 'children'),
+    Input('district-dropdown', 'value'),
+    Input('upazilla-dropdown', 'value'),
+    Input('union-dropdown', 'value'),
+    Input('village-dropdown', 'value'),
+    Input('age-slider', 'value'),
+    Input('gender-radio', 'value'),
+    Input('datatable', 'filter_query')
+)
+@metrics.instrument
+def update_export_links(selected_districts, selected_upazillas, selected_unions, selected_villages, age_range,
+                        selected_gender, filter_query):
+    query = urllib.parse.urlencode({
+        'district': selected_districts or [],
+        'upazilla': selected_upazillas or [],
+        'union': selected_unions or [],
+        'village': selected_villages or [],
+        'age': age_range,
+        'gender': selected_gender,
+        'filter': filter_query or '',
+    }, doseq=True)
+    links = [html.A("Download CSV", href=app.get_relative_path(f'/export.csv?{query}'))]
+    if openpyxl is not None:
+        links += [" | ", html.A("Download Excel", href=app.get_relative_path(f'/export.xlsx?{query}'))]
+    return links
+
+
+def export_chunks(frame, selected_districts, selected_upazillas, selected_unions, selected_villages, age_range,
+                  selected_gender, filter_query=''):
+    """Yield the table's rows matching the filters, ``export_rows`` survey rows at a time."""
+    for start in range(0, len(frame), export_rows):
+        chunk = select_records(frame.iloc[start:start + export_rows], selected_districts, selected_upazillas,
+                               selected_unions, selected_villages, age_range, selected_gender, filter_query)
+        if len(chunk):
+            yield chunk
+
+
+def export_csv(chunks):
+    out = io.StringIO()
+    # A byte order mark first, so Excel reads names outside ASCII as UTF-8
+    out.write('\ufeff')
+    csv.writer(out, lineterminator='\r\n').writerow(table_columns)
+    yield out.getvalue()
+    for chunk in chunks:
+        out = io.StringIO()
+        chunk.to_csv(out, header=False, index=False, lineterminator='\r\n')
+        yield out.getvalue()
+
+
+def export_xlsx(chunks):
+    # A write-only workbook keeps only the row being written in memory; it is spooled to a
+    # temporary file, since a zipped workbook cannot be sent before it is complete
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet, sheet_count = None, 0
+    for chunk in chunks:
+        for record in chunk.itertuples(index=False, name=None):
+            if sheet is None or sheet_count == sheet_rows:
+                sheet = workbook.create_sheet(f"Records {len(workbook.worksheets) + 1}")
+                sheet.append(table_columns)
+                sheet_count = 0
+            sheet.append([None if pd.isna(value) else value for value in record])
+            sheet_count += 1
+    if sheet is None:
+        workbook.create_sheet("Records 1").append(table_columns)
+    out = tempfile.TemporaryFile()
+    workbook.save(out)
+    out.seek(0)
+    try:
+        while True:
+            data = out.read(64 * 1024)
+            if not data:
+                break
+            yield data
+    finally:
+        out.close()
+
+
+def export(extension):
+    """Stream every record matching the filters in the query string as CSV or Excel."""
+    if extension not in ('csv', 'xlsx') or (extension == 'xlsx' and openpyxl is None):
+        flask.abort(404)
+    args = flask.request.args
+    try:
+        age_range = [int(age) for age in args.getlist('age')] or [0, 100]
+        min_age, max_age = age_range
+    except ValueError:
+        flask.abort(400)
+    chunks = export_chunks(current().frame, args.getlist('district'), args.getlist('upazilla'),
+                           args.getlist('union'), args.getlist('village'), [min_age, max_age],
+                           args.get('gender', 'All'), args.get('filter', ''))
+    if extension == 'csv':
+        body, mimetype = export_csv(chunks), 'text/csv'
+    else:
+        body, mimetype = export_xlsx(chunks), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return flask.Response(flask.stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="asharalo-personal-information.{extension}"'})
+
+
+if 'personal_information_export' not in server.view_functions:
+    server.add_url_rule(app.config.routes_pathname_prefix + 'export.<extension>', 'personal_information_export', export)
 
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -0,0 +1,98 @@
+import datetime
+import glob
+import os
+
+import flask
+from werkzeug.http import is_resource_modified
+
+from asharalo_data import dataset_version
+
+try:
+    from flask_compress import Compress
+except ImportError:  # flask-compress is optional; without it responses go out uncompressed
+    Compress = None
+
+# Shared Flask server when every dashboard is hosted in one process (see asharalo_app.py)
+server = None
+
+# Encodings offered to browsers, best first; brotli and gzip at flask-compress's fast levels
+compress_algorithms = os.environ.get('ASHARALO_COMPRESS', 'br,gzip')
+
+# Identifies the deployed code, so a new release also invalidates the layouts browsers cached
+release = os.environ.get('ASHARALO_RELEASE') or format(max(
+    (os.stat(path).st_mtime_ns for path in glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))),
+    default=0), 'x')
+
+# Dash GET responses that only change with the dataset version or the release
+_validated = ('_dash-layout', '_dash-dependencies')
+
+# When this process first served each dataset version, for Last-Modified
+_first_served = {}
+
+
+def host():
+    """Host every dashboard imported from now on under its prefix of one shared Flask server."""
+    global server
+    if server is None:
+        server = flask.Flask(__name__)
+    return server
+
+
+def dash_kwargs(prefix):
+    """Keyword arguments for ``dash.Dash``: mounted at ``prefix`` when hosted, standalone otherwise."""
+    if server is None:
+        return {}
+    return {'server': server, 'url_base_pathname': prefix}
+
+
+def _validators():
+    version = dataset_version()
+    modified = _first_served.setdefault(version, datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0))
+    return f"{version}-{release}", modified
+
+
+def _before_request():
+    request = flask.request
+    if request.method not in ('GET', 'HEAD') or not request.path.endswith(_validated):
+        return None
+    etag, modified = _validators()
+    flask.g.asharalo_validators = etag, modified
+    if not is_resource_modified(request.environ, etag=f'W/"{etag}"', last_modified=modified):
+        # The browser's copy is current: answer without building the layout again
+        response = flask.Response(status=304)
+        _validate(response, etag, modified)
+        return response
+    return None
+
+
+def _validate(response, etag, modified):
+    response.set_etag(etag, weak=True)
+    response.last_modified = modified
+    # Browsers may keep the response, but must check it is still current before using it
+    response.cache_control.no_cache = True
+
+
+def _after_request(response):
+    validators = flask.g.pop('asharalo_validators', None)
+    if validators is not None and response.status_code == 200:
+        _validate(response, *validators)
+    return response
+
+
+def register_http(server):
+    """Compress the responses of a Flask server and let browsers revalidate its Dash layouts.
+
+    Layout and dependency responses carry an ETag and Last-Modified tied to the
+    dataset version, so a repeat visit is answered with 304 Not Modified while the
+    survey is unchanged. With flask-compress installed, responses are sent brotli
+    or gzip encoded to browsers that accept it.
+    """
+    if 'asharalo_http' in server.extensions:
+        return
+    server.extensions['asharalo_http'] = True
+    server.before_request(_before_request)
+    server.after_request(_after_request)
+    if Compress is not None:
+        # Dash sets gzip only on every app it creates; the choice is read once, here
+        server.config['COMPRESS_ALGORITHM'] = compress_algorithms
+        Compress(server)
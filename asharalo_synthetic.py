@@ -0,0 +1,159 @@
+"""Synthetic survey data with the columns and answers of asharalofinal.csv.
+
+For load tests without the real survey: a District → Upazilla → Union → Village
+hierarchy with a configurable fan-out, skewed answer distributions and blanks in
+the columns the dashboards drop. Rows are generated vectorized, a chunk at a time,
+so tens of millions of rows can be written with bounded memory:
+
+    python asharalo_synthetic.py 10000000 --out asharalofinal.csv
+
+or used in-process, e.g. ``asharalo_data.swap(Dataset(survey(100000), 'synthetic'))``.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import asharalo_data
+from asharalo_locations import levels
+
+# Districts, then upazillas per district, unions per upazilla and villages per union
+fan_out = (8, 6, 8, 10)
+
+# Exponent of the Zipf-like weights: 0 is uniform, larger piles more rows on the first answers
+skew = 1.0
+
+# Share of blank answers in the columns the person income page drops blanks from
+missing = {
+    "Person's monthly income?": 0.4,
+    "Person's occupation?": 0.35,
+}
+
+chunk_rows = 1000000
+
+yes_no = ['Yes', 'No']
+family_incomes = ['5001-10000', '0-5000', '10001-15000', '15001-20000', '20001+']
+family_occupations = ['Agriculture', 'Day Labour', 'Business', 'Service', 'Rickshaw / Van Puller', 'Fisherman', 'Others']
+person_incomes = ['0-1000', '1001-3000', '3001-5000', '5001-10000', '10001+']
+person_occupations = ['Student', 'Housewife', 'Day Labour', 'Agriculture', 'Business', 'Unemployed', 'Others']
+qualifications = ['Class 1', 'Class 2', 'Class 3', 'Class 4', 'Class 5', 'Class 6', 'Class 7', 'Class 8', 'SSC', 'HSC']
+school_types = ['Government', 'Madrasa', 'Non-Government', 'Special School']
+services = [
+    'Has the Children/Person get Disability/Other Allowens',
+    'Has the Children/Person get Health sevices ( Govt./ Non- Govt. )',
+    'Has the Children/Person get Training service',
+    'Has the Children/Person get Rehabilitation allowance ',
+    'Has the Children/Person get Rehabilition Service (Govt. or Private)',
+    'In health rehabilitation service did you get Asisstive devices?',
+    'In health rehabilitation service did you get Therapy',
+    'In health rehabilitation service did you get Operation',
+    'In health rehabilitation service did you get Both (Asisstive device and Therapy) ',
+]
+
+
+def weights(count, skew=skew):
+    """Zipf-like probabilities for ``count`` answers, the first most likely."""
+    weights = 1.0 / np.arange(1, count + 1) ** skew
+    return weights / weights.sum()
+
+
+def locations(fan_out=fan_out):
+    """Names of every district, upazilla, union and village; each level lists its nodes parent by parent."""
+    names = []
+    count = 1
+    for label, children in zip(['District', 'Upazilla', 'Union', 'Village'], fan_out):
+        count *= children
+        names.append([f"{label} {i + 1}" for i in range(count)])
+    return names
+
+
+def _chunk(rng, start, rows, fan_out, skew, missing):
+    def answers(values, p=None):
+        # Categorical codes drawn in one call; the strings are shared, never copied per row
+        codes = rng.choice(len(values), rows, p=weights(len(values), skew) if p is None else p)
+        return pd.Categorical.from_codes(codes, values)
+
+    def blank(column, values):
+        # Blank (NaN) where the survey left the answer empty
+        values = np.asarray(values, dtype=object)
+        values[rng.random(rows) < missing.get(column, 0)] = np.nan
+        return values
+
+    # Pick a village, skewed towards the first ones, and derive its parents from its number
+    names = locations(fan_out)
+    village = rng.choice(len(names[-1]), rows, p=weights(len(names[-1]), skew / 2))
+    location = {}
+    for level, level_names, children in zip(reversed(levels), reversed(names), reversed(fan_out)):
+        location[level] = pd.Categorical.from_codes(village, level_names)
+        village = village // children
+
+    age = np.minimum(rng.gamma(2.0, 14.0, rows).astype(np.int64), 99)
+    child = age < 25
+    school = np.where(child, answers(yes_no, p=[0.75, 0.25]).astype(object), 'Not Applicable')
+    in_school = school == 'Yes'
+    occupation = blank("Person's occupation?", answers(person_occupations))
+
+    frame = pd.DataFrame({
+        **location,
+        'Name of child / person': np.char.add('Person ', np.arange(start, start + rows).astype(str)).astype(object),
+        'Age': age,
+        "Father's name of the child / person": answers([f"Father {i}" for i in range(1, 51)], p=weights(50, 0)),
+        'Mother name of the child / person': answers([f"Mother {i}" for i in range(1, 51)], p=weights(50, 0)),
+        'Gender': answers(['Male', 'Female', 'Others'], p=[0.52, 0.46, 0.02]),
+        'Have a disability golden citizen card?': answers(yes_no, p=[0.35, 0.65]),
+        'Is the person Skilled?': answers(yes_no, p=[0.2, 0.8]),
+        'Family monthly income?': answers(family_incomes),
+        'Specify the main occupation of the family': answers(family_occupations),
+        'Total number of family members': rng.poisson(3.5, rows) + 1,
+        "Person's monthly income?": blank("Person's monthly income?", answers(person_incomes)),
+        "Person's occupation?": occupation,
+        # Only answered for people with an occupation, so its blanks follow the occupation's
+        'Age for Occ': np.where(pd.isna(occupation), np.nan, age),
+        'Does the child / person go to school / study?': school,
+        'Educational Qualification of the child / individual (Enter the class he / she is passing at last):':
+            np.where(in_school, answers(qualifications, p=weights(len(qualifications), 0)).astype(object), 'Not Applicable'),
+        'If yes, what kind of school do you go to?':
+            np.where(in_school, answers(school_types).astype(object), 'Not Applicable'),
+        'Has the Children/Person get Education stipend ':
+            np.where(in_school, answers(yes_no, p=[0.4, 0.6]).astype(object), 'Not Applicable'),
+    })
+    for column in services:
+        frame[column] = answers(yes_no, p=[0.25, 0.75])
+    # Only the filter columns stay categorical, as when the CSV is parsed
+    text = {column: frame[column].cat.categories.dtype for column in frame
+            if isinstance(frame[column].dtype, pd.CategoricalDtype) and column not in asharalo_data.schema}
+    return frame[asharalo_data.columns].astype(text)
+
+
+def chunks(rows, seed=0, fan_out=fan_out, skew=skew, missing=missing, chunk_rows=chunk_rows):
+    """Yield ``rows`` synthetic survey rows as frames of at most ``chunk_rows`` rows."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunk_rows):
+        yield _chunk(rng, start, min(chunk_rows, rows - start), fan_out, skew, missing)
+
+
+def survey(rows, seed=0, fan_out=fan_out, skew=skew, missing=missing):
+    """A synthetic survey frame typed like a parsed asharalofinal.csv."""
+    frame = pd.concat(chunks(rows, seed, fan_out, skew, missing), ignore_index=True)
+    # Like the parser, only list the locations and answers that occur, sorted
+    return frame.astype({column: pd.CategoricalDtype(frame[column].cat.remove_unused_categories().cat.categories.sort_values())
+                         for column in asharalo_data.schema})
+
+
+def write_csv(path, rows, seed=0, fan_out=fan_out, skew=skew, missing=missing):
+    """Write a synthetic survey CSV, one chunk at a time."""
+    for number, chunk in enumerate(chunks(rows, seed, fan_out, skew, missing)):
+        chunk.to_csv(path, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--out', default='asharalofinal.csv')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--fan-out', type=int, nargs=4, default=fan_out,
+                        metavar=('DISTRICTS', 'UPAZILLAS', 'UNIONS', 'VILLAGES'))
+    parser.add_argument('--skew', type=float, default=skew)
+    args = parser.parse_args()
+    print(write_csv(args.out, args.rows, args.seed, tuple(args.fan_out), args.skew))
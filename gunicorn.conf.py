@@ -0,0 +1,9 @@
+# Load the app (and the memory-mapped survey snapshot) once in the master process,
+# so forked workers share its pages instead of each loading a private copy
+preload_app = True
+
+
+def post_fork(server, worker):
+    # Each worker polls for new survey versions itself; threads do not survive the fork
+    import asharalo_data
+    asharalo_data.start_refresher()
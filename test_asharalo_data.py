@@ -0,0 +1,59 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import asharalo_synthetic
+from asharalo_data import Dataset, concat, validate
+
+
+def _row_count(frame):
+    # Not mergeable: derived from the whole frame of the version
+    return len(frame)
+
+
+def test_derive_after_append():
+    frame = asharalo_synthetic.survey(300, seed=1)
+    dataset = Dataset(frame.iloc[:200].reset_index(drop=True), 'v1').append(frame.iloc[200:], 'batch-1')
+    result = []
+    thread = threading.Thread(target=lambda: result.append(dataset.derive(_row_count)), daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), "derive() deadlocked on the frame of an appended version"
+    assert result == [300]
+
+
+def test_version_follows_applied_batches():
+    frame = asharalo_synthetic.survey(300, seed=1)
+    base = Dataset(frame.iloc[:200].reset_index(drop=True), 'v1')
+    first, second = frame.iloc[200:230], frame.iloc[230:]
+    ab = base.append(first, 'a').append(second, 'b')
+    assert ab.version == base.append(first, 'a').append(second, 'b').version
+    # Same total of rows, different batches or order
+    assert ab.version != base.append(second, 'a').append(first, 'b').version
+    assert ab.version != base.append(first, 'c').append(second, 'b').version
+
+
+def test_append_adds_to_previous_frame():
+    frame = asharalo_synthetic.survey(300, seed=1)
+    first = Dataset(frame.iloc[:200].reset_index(drop=True), 'v1').append(frame.iloc[200:250], 'a')
+    built = first.frame
+    second = first.append(frame.iloc[250:], 'b')
+    # Only the previous version's frame and the new batch are kept until the frame is built
+    assert second._parts[0] is built and len(second._parts) == 2
+    assert second.rows == 300
+    assert second.frame['Age'].tolist() == frame['Age'].tolist()
+    assert second._parts is None
+
+
+def test_concat_sorts_categories():
+    chunks = [pd.DataFrame({'District': pd.Series(names, dtype='category')}) for names in (['Rangpur', 'Rangpur'], ['Bogura'])]
+    frame = concat(chunks)
+    assert frame['District'].cat.categories.tolist() == ['Bogura', 'Rangpur']
+    assert frame.sort_values('District')['District'].tolist() == ['Bogura', 'Rangpur', 'Rangpur']
+
+
+def test_validate_requires_every_dashboard_column():
+    frame = asharalo_synthetic.survey(10, seed=1).drop(columns=["Person's monthly income?"])
+    with pytest.raises(ValueError, match="Person's monthly income"):
+        validate(Dataset(frame, 'v1'))
@@ -0,0 +1,10 @@
+import pandas as pd
+
+from asharalo_index import mask, select
+
+
+def test_mask_of_plain_columns():
+    # Neither column is categorical, so the conditions come straight from the columns' arrays
+    frame = pd.DataFrame({'a': [1, 2, 1], 'b': ['p', 'p', 'q']})
+    assert mask(frame, {'a': [1], 'b': 'p'}).tolist() == [True, False, False]
+    assert select(frame, {'a': 1}, extra=(frame['b'] == 'q').to_numpy())['b'].tolist() == ['q']